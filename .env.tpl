@@ -10,6 +10,9 @@ LAMB_LOG_JSON_ENABLE=true
 LAMB_EXECUTION_TIME_TIMESCALE=true
 LAMB_ADD_CORS_ENABLED=false
 LAMB_VERBOSE_SQL_LOG=false
+LAMB_AUTH_TOKEN_MODE=DB
+# gunicorn profile: sync, asgi
+LAMB_GUNICORN_PROFILE=sync
 
 LAMB_REDIS_HOST=localhost
 
@@ -18,6 +21,9 @@ LAMB_SMTP_PASS=
 LAMB_SMTP_HOST=
 LAMB_SMTP_PORT=
 LAMB_SMTP_TLS=
+# local debugging server: python -m aiosmtpd -n -l localhost:1025
+LAMB_SMTP_FROM=
+LAMB_SMTP_RATE_LIMIT=10
 
 # APP
 APP_SECRET_KEY=123
@@ -25,4 +31,10 @@ APP_SECRET_KEY=123
 APP_POSTGRES_USER={{project_name}}_user
 APP_POSTGRES_PASS=
 APP_POSTGRES_NAME={{project_name}}
-APP_POSTGRES_HOST=localhost
\ No newline at end of file
+APP_POSTGRES_HOST=localhost
+# S3 (point to local MinIO-compatible server for development)
+LAMB_S3_ENDPOINT_URL=http://localhost:9000
+LAMB_S3_BUCKET_URL=http://localhost:9000/dev-bucket
+LAMB_S3_BUCKET_NAME=dev-bucket
+LAMB_S3_ACCESS_KEY=
+LAMB_S3_SECRET_KEY=
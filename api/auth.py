@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import lamb.exc as exc
+from lamb.utils import LambRequest
+
+from api.models import AccessToken
+from core.auth import token_rejected
+from core.tokens import AccessClaims
+
+__all__ = ["request_claims"]
+
+
+def request_claims(request: LambRequest) -> AccessClaims:
+    """Claims of caller authenticated by access token accepted in TokenAuthMiddleware
+
+    Middleware leaves claims unset only on LAMB_AUTH_EXEMPT_URLS paths, there DB token is looked up here and
+    rejected tokens are remembered by worker negative cache.
+    """
+    if (claims := getattr(request, "app_claims", None)) is not None:
+        return claims
+
+    token = getattr(request, "app_access_token", None)
+    if token is None:
+        raise exc.AuthTokenInvalidError("Access token is not provided")
+    try:
+        claims = AccessToken.validate(request.lamb_db_session, token)
+    except exc.AuthTokenExpiredError:
+        token_rejected(token, "expired")
+        raise
+    except exc.AuthTokenInvalidError:
+        token_rejected(token, "invalid")
+        raise
+
+    request.app_claims = claims
+    return claims
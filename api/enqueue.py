@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import dataclasses
+import uuid
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import Any
+
+from celery import Task
+from celery.result import AsyncResult
+
+from lamb.utils import tz_now
+
+from core.celery_messages import redis_task_message
+from core.utils import async_redis_client
+from {{project_name}}.celery_config import CeleryQueues, celery_app
+
+__all__ = ["TaskCall", "enqueue_async", "enqueue_many_async"]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class TaskCall:
+    task: Task | str
+    args: list | tuple | None = None
+    kwargs: dict[str, Any] | None = None
+    queue: CeleryQueues | str | None = None
+    countdown: float | None = None
+    expires: float | None = None
+    task_id: str | None = None
+
+
+def _message(call: TaskCall) -> tuple[str, str, str]:
+    task_name = call.task if isinstance(call.task, str) else call.task.name
+    queue = call.queue or getattr(call.task, "queue", None) or CeleryQueues.default
+    now = tz_now()
+    task_id = call.task_id or str(uuid.uuid4())
+    key, message = redis_task_message(
+        celery_app,
+        task_name=task_name,
+        queue=queue.value if isinstance(queue, CeleryQueues) else queue,
+        args=call.args,
+        kwargs=call.kwargs,
+        task_id=task_id,
+        eta=now + timedelta(seconds=call.countdown) if call.countdown else None,
+        expires=now + timedelta(seconds=call.expires) if call.expires else None,
+    )
+    return task_id, key, message
+
+
+async def enqueue_many_async(calls: Iterable[TaskCall]) -> list[AsyncResult]:
+    """Publishes tasks to broker in single pipelined round trip without blocking event loop
+
+    Messages are celery protocol v2 envelopes pushed straight to queue lists through shared asyncio
+    connection pool, so task publish signals and result backend bookkeeping of apply_async are skipped.
+    """
+    messages = [_message(call) for call in calls]
+    if not messages:
+        return []
+
+    pipeline = async_redis_client("broker").pipeline(transaction=False)
+    for _, key, message in messages:
+        pipeline.lpush(key, message)
+    await pipeline.execute()
+    return [celery_app.AsyncResult(task_id) for task_id, _, _ in messages]
+
+
+async def enqueue_async(
+    task: Task | str,
+    args: list | tuple | None = None,
+    kwargs: dict[str, Any] | None = None,
+    queue: CeleryQueues | str | None = None,
+    countdown: float | None = None,
+    expires: float | None = None,
+    task_id: str | None = None,
+) -> AsyncResult:
+    """Async counterpart of task.apply_async for ASGI views, routing defaults to task queue"""
+    call = TaskCall(task, args, kwargs, queue, countdown, expires, task_id)
+    task_id, key, message = _message(call)
+    await async_redis_client("broker").lpush(key, message)
+    return celery_app.AsyncResult(task_id)
@@ -0,0 +1,57 @@
+import logging
+import time
+from unittest import mock
+
+from django.conf import settings
+from sqlalchemy import select
+
+from lamb.db.session import lamb_db_session_maker
+from lamb.management.base import LambCommand
+
+from api.models import AbstractUser, AccessToken
+from core.constants import AccessTokenMode
+
+logger = logging.getLogger(__name__)
+
+
+class Command(LambCommand):
+    help = "benchmark access token validation: database lookup vs JWT"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "-iterations",
+            type=int,
+            dest="iterations",
+            default=10000,
+            help="number of validations per mode",
+        )
+
+    def _bench(self, session, mode: AccessTokenMode, user: AbstractUser, iterations: int) -> float:
+        with mock.patch.object(settings, "LAMB_AUTH_TOKEN_MODE", mode.value):
+            token = AccessToken.generate(user)
+            session.add(token)
+            session.flush()
+
+            start = time.perf_counter()
+            for _ in range(iterations):
+                # expunge to force real lookup on each iteration as in request scoped sessions
+                session.expunge_all()
+                AccessToken.validate(session, token.access_token)
+            return time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+
+        session = lamb_db_session_maker()
+        try:
+            user = session.execute(select(AbstractUser).limit(1)).scalar_one()
+            for mode in AccessTokenMode:
+                elapsed = self._bench(session, mode, user, iterations)
+                logger.info(
+                    f"{mode.value}: {iterations} validations in {elapsed:.3f}s, "
+                    f"{elapsed / iterations * 1e6:.1f}us/op, {iterations / elapsed:.0f} ops/s"
+                )
+        finally:
+            session.rollback()
+            session.close()
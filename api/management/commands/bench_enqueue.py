@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+
+from lamb.management.base import LambCommand
+
+from api.enqueue import TaskCall, enqueue_async, enqueue_many_async
+from api.tasks import some_task
+from core.utils import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class Command(LambCommand):
+    help = "benchmark task enqueue from event loop: apply_async in thread vs asyncio redis publish"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "-tasks",
+            type=int,
+            dest="tasks",
+            default=10000,
+            help="number of tasks per variant",
+        )
+        parser.add_argument(
+            "-concurrency",
+            type=int,
+            dest="concurrency",
+            default=100,
+            help="concurrent enqueue calls, as from parallel requests",
+        )
+        parser.add_argument(
+            "-batch_size",
+            type=int,
+            dest="batch_size",
+            default=100,
+            help="tasks per pipelined batch",
+        )
+        parser.add_argument(
+            "-queue",
+            type=str,
+            dest="queue",
+            default="bench",
+            help="queue without consumers, removed after benchmark",
+        )
+
+    @staticmethod
+    async def _run(publish, tasks: int, concurrency: int) -> tuple[float, float]:
+        """Returns elapsed time and max event loop lag observed by 1ms ticker"""
+        lag = 0.0
+        done = asyncio.Event()
+
+        async def ticker():
+            nonlocal lag
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lag = max(lag, time.perf_counter() - start - 0.001)
+
+        async def worker(count: int):
+            for _ in range(count):
+                await publish()
+
+        ticker_task = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        per_worker = tasks // concurrency
+        await asyncio.gather(*[worker(per_worker) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - start
+        done.set()
+        await ticker_task
+        return elapsed, lag
+
+    async def _bench(self, tasks: int, concurrency: int, batch_size: int, queue: str):
+        apply_async = sync_to_async(some_task.apply_async, thread_sensitive=False)
+        batch = [TaskCall(some_task, queue=queue)] * batch_size
+
+        variants = {
+            "sync_to_async(apply_async)": (lambda: apply_async(queue=queue), tasks),
+            "enqueue_async": (lambda: enqueue_async(some_task, queue=queue), tasks),
+            f"enqueue_many_async x{batch_size}": (lambda: enqueue_many_async(batch), tasks // batch_size),
+        }
+        for name, (publish, calls) in variants.items():
+            elapsed, lag = await self._run(publish, calls, min(concurrency, calls))
+            published = calls * (batch_size if name.startswith("enqueue_many") else 1)
+            logger.info(
+                f"{name:<30}: {published} tasks in {elapsed:.3f}s, {published / elapsed:.0f} tasks/s, "
+                f"max loop lag {lag * 1000:.1f}ms"
+            )
+
+    def handle(self, *args, **options):
+        queue = options["queue"]
+        try:
+            asyncio.run(self._bench(options["tasks"], options["concurrency"], options["batch_size"], queue))
+        finally:
+            redis_client("broker").delete(queue, f"_kombu.binding.{queue}")
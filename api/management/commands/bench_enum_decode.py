@@ -0,0 +1,83 @@
+import logging
+import time
+import uuid
+
+from sqlalchemy import insert, select, type_coerce
+from sqlalchemy.dialects.postgresql import ENUM
+
+from lamb.db.session import lamb_db_session_maker
+from lamb.management.base import LambCommand
+
+from api.models import AbstractUser
+from core.constants import UserRole
+
+logger = logging.getLogger(__name__)
+
+
+class Command(LambCommand):
+    help = "benchmark decoding and encoding of enum columns on large user listing"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "-rows",
+            type=int,
+            dest="rows",
+            default=100_000,
+            help="number of users in listing",
+        )
+        parser.add_argument(
+            "-iterations",
+            type=int,
+            dest="iterations",
+            default=5,
+            help="number of listings per variant, best time is reported",
+        )
+
+    @staticmethod
+    def _best(func, iterations: int) -> float:
+        result = float("inf")
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            result = min(result, time.perf_counter() - start)
+        return result
+
+    def handle(self, *args, **options):
+        rows, iterations = options["rows"], options["iterations"]
+        table = AbstractUser.__table__
+        # stock sqlalchemy enum decoding as it was before shared lookups
+        stock_role = ENUM(UserRole, values_callable=lambda obj: [e.value for e in obj], name=UserRole.__pg_name__)
+
+        session = lamb_db_session_maker()
+        try:
+            roles = list(UserRole)
+            session.execute(
+                insert(table),
+                [
+                    {"user_id": uuid.uuid4(), "role": roles[i % len(roles)], "password_hash": "", "is_active": True}
+                    for i in range(rows)
+                ],
+            )
+            session.flush()
+
+            query_new = select(table.c.user_id, table.c.role).limit(rows)
+            query_stock = select(table.c.user_id, type_coerce(table.c.role, stock_role)).limit(rows)
+            listing = session.execute(query_new).all()
+
+            timings = {
+                "fetch stock enum": self._best(lambda: session.execute(query_stock).all(), iterations),
+                "fetch PG_ENUM": self._best(lambda: session.execute(query_new).all(), iterations),
+                "encode dict per row": self._best(
+                    lambda: [{"id": r.role.value, "title": r.role.title} for r in listing], iterations
+                ),
+                "encode cached": self._best(lambda: [r.role.handbook_encode() for r in listing], iterations),
+            }
+            for name, elapsed in timings.items():
+                logger.info(
+                    f"{name:<20}: {len(listing)} rows in {elapsed * 1000:.1f}ms, "
+                    f"{elapsed / len(listing) * 1e9:.0f}ns/row"
+                )
+        finally:
+            session.rollback()
+            session.close()
@@ -0,0 +1,119 @@
+import csv
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+
+from lamb.management.base import LambCommand
+
+logger = logging.getLogger(__name__)
+
+
+class Command(LambCommand):
+    help = "benchmark gunicorn deployment profiles with locust"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "-profiles",
+            type=str,
+            dest="profiles",
+            default="sync,asgi",
+            help="comma separated LAMB_GUNICORN_PROFILE values",
+        )
+        parser.add_argument(
+            "-users",
+            type=int,
+            dest="users",
+            default=200,
+            help="concurrent locust users",
+        )
+        parser.add_argument(
+            "-duration",
+            type=str,
+            dest="duration",
+            default="60s",
+            help="run time of every profile",
+        )
+        parser.add_argument(
+            "-port",
+            type=int,
+            dest="port",
+            default=8010,
+            help="port used by benchmarked server",
+        )
+
+    def handle(self, *args, **options):
+        base_dir = Path(settings.BASE_DIR)
+        host = f"http://127.0.0.1:{options['port']}"
+
+        results = []
+        for profile in options["profiles"].split(","):
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--bind", host.removeprefix("http://")],
+                cwd=base_dir,
+                env={**os.environ, "LAMB_GUNICORN_PROFILE": profile},
+            )
+            try:
+                self._wait_ready(f"{host}/api/ping")
+                with tempfile.TemporaryDirectory() as folder:
+                    prefix = Path(folder, profile)
+                    subprocess.run(
+                        [
+                            sys.executable,
+                            "-m",
+                            "locust",
+                            "-f",
+                            str(base_dir.joinpath("locustfile.py")),
+                            "--headless",
+                            "--only-summary",
+                            "-u",
+                            str(options["users"]),
+                            "-r",
+                            str(max(options["users"] // 4, 1)),
+                            "-t",
+                            options["duration"],
+                            "--host",
+                            host,
+                            "--csv",
+                            str(prefix),
+                        ],
+                        # locust exits with error code on any failed request, failures are reported in table
+                        check=False,
+                        capture_output=True,
+                    )
+                    with open(f"{prefix}_stats.csv") as f:
+                        aggregated = next(r for r in csv.DictReader(f) if r["Name"] == "Aggregated")
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+            results.append((profile, aggregated))
+            logger.info(f"Profile {profile} done: {aggregated['Requests/s']} rps")
+
+        results.sort(key=lambda r: float(r[1]["Requests/s"]), reverse=True)
+        logger.info(f"{'profile':<10}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}{'failures':>10}")
+        for profile, row in results:
+            logger.info(
+                f"{profile:<10}{float(row['Requests/s']):>10.1f}{row['50%']:>10}{row['99%']:>10}"
+                f"{row['Failure Count']:>10}"
+            )
+
+    @staticmethod
+    def _wait_ready(url: str, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(url, timeout=1):
+                    return
+            except (urllib.error.URLError, OSError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.5)
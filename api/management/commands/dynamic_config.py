@@ -0,0 +1,49 @@
+import json
+import logging
+
+from lamb.management.base import LambCommand
+
+import api.views  # noqa: F401 - settings are declared next to their users, models are loaded by django setup
+from core.dynamic_config import dynamic_config_reset, dynamic_config_set, dynamic_settings
+
+logger = logging.getLogger(__name__)
+
+
+class Command(LambCommand):
+    help = "list or change runtime settings stored in redis"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "-key",
+            type=str,
+            dest="key",
+            default=None,
+            help="dynamic setting key",
+        )
+        parser.add_argument(
+            "-value",
+            type=str,
+            dest="value",
+            default=None,
+            help="new value encoded as json",
+        )
+        parser.add_argument(
+            "-reset",
+            action="store_true",
+            dest="reset",
+            help="remove stored value and fall back to default",
+        )
+
+    def handle(self, *args, **options):
+        key = options["key"]
+        if key is not None and options["reset"]:
+            dynamic_config_reset(key)
+            logger.info(f"Dynamic setting reset: {key}")
+        elif key is not None and options["value"] is not None:
+            dynamic_config_set(key, json.loads(options["value"]))
+            logger.info(f"Dynamic setting changed: {key}={options['value']}")
+
+        for setting in dynamic_settings().values():
+            if key is None or setting.key == key:
+                logger.info(f"{setting.key}: value={setting.value!r}, default={setting.default!r}")
@@ -0,0 +1,65 @@
+import logging
+import time
+
+from lamb.db.session import lamb_db_session_maker
+from lamb.management.base import LambCommand
+
+from api.outbox import outbox_relay
+
+logger = logging.getLogger(__name__)
+
+
+class Command(LambCommand):
+    help = "publish tasks stored in outbox to broker"
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            "-batch_size",
+            type=int,
+            dest="batch_size",
+            default=1000,
+            help="rows claimed per transaction",
+        )
+        parser.add_argument(
+            "-poll_interval",
+            type=float,
+            dest="poll_interval",
+            default=0.5,
+            help="sleep seconds when outbox is empty",
+        )
+        parser.add_argument(
+            "-once",
+            action="store_true",
+            dest="once",
+            help="drain outbox and exit",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        poll_interval = options["poll_interval"]
+
+        session = lamb_db_session_maker()
+        sent, window_start = 0, time.monotonic()
+        try:
+            while True:
+                try:
+                    count = outbox_relay(session, limit=batch_size)
+                except Exception as e:
+                    session.rollback()
+                    logger.exception(f"Outbox relay batch failed: {e}")
+                    time.sleep(poll_interval)
+                    continue
+
+                sent += count
+                elapsed = time.monotonic() - window_start
+                if elapsed >= 10 and sent:
+                    logger.info(f"Outbox relay: {sent} tasks in {elapsed:.1f}s, {sent / elapsed:.0f} tasks/s")
+                    sent, window_start = 0, time.monotonic()
+
+                if count < batch_size:
+                    if options["once"]:
+                        break
+                    time.sleep(poll_interval)
+        finally:
+            session.close()
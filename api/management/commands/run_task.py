@@ -1,4 +1,6 @@
 import logging
+import time
+import uuid
 
 from lamb.management.base import LambCommand
 
@@ -19,11 +21,61 @@ class Command(LambCommand):
             dest="task_name",
             help="task_name",
         )
+        parser.add_argument(
+            "-map_job",
+            type=str,
+            dest="map_job",
+            help="chunked job registered in api.tasks to run with chunked_map",
+        )
+        parser.add_argument(
+            "-run_id",
+            type=str,
+            dest="run_id",
+            default=None,
+            help="chunked map run to resume",
+        )
+        parser.add_argument(
+            "-follow",
+            action="store_true",
+            dest="follow",
+            help="report chunked map progress and throughput until finished",
+        )
 
     def handle(self, *args, **options):
+        if options.get("map_job"):
+            self._run_map_job(options["map_job"], options["run_id"] or uuid.uuid4().hex, options["follow"])
+            return
+
         task_name = options.get("task_name")
 
         task = import_by_name(f"api.tasks.{task_name}")
 
         task.si().apply_async({"expires": 60 * 60})
         logger.info(f"Did send to broker {task_name} task")
+
+    def _run_map_job(self, job_name: str, run_id: str, follow: bool):
+        from api.tasks import chunked_map, chunked_map_progress
+
+        chunked_map.si(job_name, run_id).apply_async(expires=60 * 60)
+        logger.info(f"Did send to broker chunked map {job_name}: run_id={run_id}")
+        if not follow:
+            return
+
+        while True:
+            time.sleep(5)
+            progress = chunked_map_progress(run_id)
+            if progress["total"] is None:
+                logger.info(f"Chunked map {job_name}: waiting for plan")
+                continue
+            elapsed = time.time() - progress["started"]
+            logger.info(
+                f"Chunked map {job_name}: chunks={progress['done']}/{progress['total']}, failed={progress['failed']}, "
+                f"rows={progress['processed']}, rows/s={progress['processed'] / max(elapsed, 1e-6):.0f}, "
+                f"worker rows/s={progress['processed'] / max(progress['seconds'], 1e-6):.0f}"
+            )
+            if progress["done"] + progress["failed"] >= progress["total"]:
+                if progress["failed"]:
+                    logger.error(
+                        f"Chunked map {job_name}: {progress['failed']} chunks failed, resume with -run_id {run_id}"
+                    )
+                break
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import inspect
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+
+import lamb.exc as exc
+from lamb.db.session import lamb_db_session_maker
+from lamb.middleware.rest import LambRestApiJsonMiddleware
+from lamb.utils import LambRequest
+
+from api.models import AccessToken
+from core.auth import token_format_valid, token_rejected, token_rejection
+from core.coalesce import single_flight_response
+from core.constants import AccessTokenMode
+from core.geoip import geoip_service
+from core.metrics import (
+    AUTH_SHORT_CIRCUITED,
+    DB_TIME,
+    MIDDLEWARE_LATENCY,
+    REDIS_TIME,
+    RESPONSE_SIZE,
+    VIEW_LATENCY,
+    current_timings,
+    request_timings,
+    reset_timings,
+)
+from core.profiling import StackSampler, store_request_profile
+from core.tokens import access_token_mode, jwt_decode_access_token
+
+__all__ = [
+    "CoalesceMiddleware",
+    "GeoIPMiddleware",
+    "MetricsMiddleware",
+    "MiddlewareTimer",
+    "ProfilingMiddleware",
+    "TokenAuthMiddleware",
+]
+
+logger = logging.getLogger(__name__)
+
+
+class _BaseMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: LambRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request: LambRequest):
+        self.process_request(request)
+        return await self.get_response(request)
+
+    def process_request(self, request: LambRequest):
+        pass
+
+
+class GeoIPMiddleware(_BaseMiddleware):
+    """Attaches cached GeoIP info for client address as request.app_geoip"""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.service = geoip_service() if settings.LAMB_GEOIP_SERVICE_ENABLED else None
+
+    def process_request(self, request: LambRequest):
+        if self.service is None:
+            request.app_geoip = None
+            return
+        device_info = getattr(request, "lamb_device_info", None)
+        ip = getattr(device_info, "ip_address", None) or request.META.get("REMOTE_ADDR")
+        request.app_geoip = self.service.lookup(ip)
+
+
+class CoalesceMiddleware(_BaseMiddleware):
+    """Coalesces concurrent GET requests to handlers marked with core.coalesce.single_flight
+
+    Placed in front of database session and LambRestApiJsonMiddleware, so followers skip both and get copy
+    of response rendered by regular chain. Only async chain (ASGI) has event loop to share flights on.
+    """
+
+    async def __acall__(self, request: LambRequest):
+        return await single_flight_response(request, self.get_response)
+
+
+# auth
+# process_request result for DB token not known as rejected
+_DB_LOOKUP = object()
+
+
+class TokenAuthMiddleware(_BaseMiddleware):
+    """Rejects bad access tokens before database session is opened
+
+    Token from LAMB_AUTH_HEADER is checked for format and against per-worker negative cache of recently
+    rejected tokens. JWT tokens are fully validated here, as that needs no database. DB tokens are looked up
+    with own short session, rejected ones are remembered in negative cache so following requests with them skip
+    the lookup, accepted ones are checked on every request. Bad tokens are answered with 401 right away, paths of
+    LAMB_AUTH_EXEMPT_URLS are never rejected. Token is exposed as request.app_access_token and its claims
+    as request.app_claims.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.exempt = [re.compile(p) for p in settings.LAMB_AUTH_EXEMPT_URLS]
+        # rejections rendered by lamb the same way as errors raised in views
+        self.errors = LambRestApiJsonMiddleware(get_response)
+
+    def __call__(self, request: LambRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        if (response := self.process_request(request)) is _DB_LOOKUP:
+            response = self.process_db_token(request)
+        if response is not None:
+            return response
+        return self.get_response(request)
+
+    async def __acall__(self, request: LambRequest):
+        if (response := self.process_request(request)) is _DB_LOOKUP:
+            response = await sync_to_async(self.process_db_token, thread_sensitive=False)(request)
+        if response is not None:
+            return response
+        return await self.get_response(request)
+
+    def _reject(self, request: LambRequest, reason: str, error: exc.ApiError) -> HttpResponse:
+        AUTH_SHORT_CIRCUITED.labels(reason).inc()
+        return self.errors.process_exception(request, error)
+
+    def process_db_token(self, request: LambRequest) -> HttpResponse | None:
+        token = request.app_access_token
+        session = lamb_db_session_maker()
+        try:
+            claims = AccessToken.validate(session, token)
+        except exc.AuthTokenExpiredError as e:
+            reason, error = "expired", e
+        except exc.AuthTokenInvalidError as e:
+            reason, error = "invalid", e
+        else:
+            request.app_claims = claims
+            return None
+        finally:
+            session.close()
+        token_rejected(token, reason)
+        return self._reject(request, reason, error)
+
+    def process_request(self, request: LambRequest) -> HttpResponse | object | None:
+        request.app_claims = None
+        request.app_access_token = token = request.META.get(settings.LAMB_AUTH_HEADER) or None
+        if token is None or any(p.match(request.path) for p in self.exempt):
+            return None
+
+        if not token_format_valid(token):
+            reason, error = "malformed", exc.AuthTokenInvalidError()
+        elif (rejection := token_rejection(token)) is not None:
+            reason = f"cached_{rejection}"
+            error = exc.AuthTokenExpiredError() if rejection == "expired" else exc.AuthTokenInvalidError()
+        elif access_token_mode() == AccessTokenMode.JWT:
+            try:
+                request.app_claims = jwt_decode_access_token(token)
+                return None
+            except exc.AuthTokenExpiredError as e:
+                reason, error = "expired", e
+            except exc.AuthTokenInvalidError as e:
+                reason, error = "invalid", e
+            token_rejected(token, reason)
+        else:
+            return _DB_LOOKUP
+
+        return self._reject(request, reason, error)
+
+
+# metrics
+class MetricsMiddleware(_BaseMiddleware):
+    """Records latency, db/redis time and response size of sampled requests
+
+    Should be first in MIDDLEWARE - decides sampling for MiddlewareTimer instances
+    """
+
+    def __call__(self, request: LambRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= settings.LAMB_METRICS_SAMPLE_RATE:
+            request.app_metrics_sampled = False
+            return self.get_response(request)
+
+        request.app_metrics_sampled = True
+        token = request_timings()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self._observe(request, response, time.perf_counter() - start, current_timings())
+            return response
+        finally:
+            reset_timings(token)
+
+    async def __acall__(self, request: LambRequest):
+        if random.random() >= settings.LAMB_METRICS_SAMPLE_RATE:
+            request.app_metrics_sampled = False
+            return await self.get_response(request)
+
+        request.app_metrics_sampled = True
+        token = request_timings()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self._observe(request, response, time.perf_counter() - start, current_timings())
+            return response
+        finally:
+            reset_timings(token)
+
+    @staticmethod
+    def _observe(request: LambRequest, response, elapsed: float, timings):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match is not None else "unresolved"
+        VIEW_LATENCY.labels(view, request.method, response.status_code).observe(elapsed)
+        DB_TIME.labels(view).observe(timings.db)
+        REDIS_TIME.labels(view).observe(timings.redis)
+        if not getattr(response, "streaming", False):
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+
+
+# profiling
+class ProfilingMiddleware(_BaseMiddleware):
+    """Samples stacks while request carrying LAMB_PROFILING_HEADER is processed, only in god mode
+
+    Collapsed stacks are stored in redis under request xray (returned in X-Lamb-Profile header) and served by
+    debug/profile endpoint. Sync worker samples request thread only; under ASGI all threads are sampled,
+    because blocking work runs in executor threads, so concurrent requests of the worker are visible too.
+    """
+
+    def __call__(self, request: LambRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._requested(request):
+            return self.get_response(request)
+
+        sampler = StackSampler(settings.LAMB_PROFILING_REQUEST_INTERVAL, thread_ids={threading.get_ident()}).start()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        return self._finish(request, response, sampler)
+
+    async def __acall__(self, request: LambRequest):
+        if not self._requested(request):
+            return await self.get_response(request)
+
+        sampler = StackSampler(settings.LAMB_PROFILING_REQUEST_INTERVAL).start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sampler.stop()
+        return self._finish(request, response, sampler)
+
+    @staticmethod
+    def _requested(request: LambRequest) -> bool:
+        return settings.LAMB_APP_GOD_MODE and settings.LAMB_PROFILING_HEADER in request.META
+
+    @staticmethod
+    def _finish(request: LambRequest, response, sampler: StackSampler):
+        xray = getattr(request, "xray", None) or request.META.get(settings.LAMB_LOG_HEADER_XRAY) or uuid.uuid4().hex
+        store_request_profile(str(xray), sampler.collapsed())
+        response.headers["X-Lamb-Profile"] = str(xray)
+        logger.info(f"Request profiled: xray={xray}, samples={sampler.samples.total()}")
+        return response
+
+
+class MiddlewareTimer(_BaseMiddleware):
+    """Observes exclusive time of middleware placed right after it in MIDDLEWARE
+
+    Settings put timer in front of every middleware and one more at the end. Each timer measures inclusive
+    time of the rest of chain, exclusive time of middleware is difference with inclusive time of the next
+    timer (zero if middleware answered without calling downstream). Only requests sampled by
+    MetricsMiddleware are measured.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        target = inspect.unwrap(get_response)
+        # trailing timer wraps view handler - its time is only subtracted by previous timer
+        self.observer = None if inspect.ismethod(target) else MIDDLEWARE_LATENCY.labels(type(target).__name__)
+
+    def _enter(self, request: LambRequest) -> int:
+        marks = request.__dict__.setdefault("app_metrics_inclusive", [])
+        marks.append(0.0)
+        return len(marks) - 1
+
+    def _exit(self, request: LambRequest, index: int, elapsed: float):
+        marks = request.app_metrics_inclusive
+        marks[index] = elapsed
+        if self.observer is not None:
+            downstream = marks[index + 1] if index + 1 < len(marks) else 0.0
+            self.observer.observe(max(elapsed - downstream, 0.0))
+
+    def __call__(self, request: LambRequest):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not getattr(request, "app_metrics_sampled", False):
+            return self.get_response(request)
+        index, start = self._enter(request), time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self._exit(request, index, time.perf_counter() - start)
+
+    async def __acall__(self, request: LambRequest):
+        if not getattr(request, "app_metrics_sampled", False):
+            return await self.get_response(request)
+        index, start = self._enter(request), time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self._exit(request, index, time.perf_counter() - start)
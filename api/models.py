@@ -1,21 +1,27 @@
 from __future__ import annotations
 
+import datetime
 import logging
 import secrets
 import uuid
 from typing import Any, Self
 
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.contrib.auth.hashers import check_password, make_password
 from sqlalchemy import (
     ForeignKey,
     Identity,
+    Index,
+    select,
     text,
 )
+from sqlalchemy import types as sa_types
 from sqlalchemy.dialects.postgresql import ENUM, SMALLINT
 from sqlalchemy.exc import DBAPIError, SQLAlchemyError
 from sqlalchemy.orm import (
     Mapped,
+    Session,
     mapped_column,
     object_session,
     relationship,
@@ -38,26 +44,47 @@ from lamb.types.annotations.postgresql import (
 from lamb.utils import TZ_MSK, tz_now
 
 from core.constants import (
+    AccessTokenMode,
     IntStrEnumType,
     PGEnumMixin,
     UserEventCode,
     UserRole,
+    enum_lookup,
 )
+from core.dynamic_config import dynamic_setting
+from core.tokens import AccessClaims, access_token_mode, jwt_decode_access_token, jwt_encode_access_token
 
 logger = logging.getLogger(__name__)
 
 sql_logging_enable()
 
+# dynamic settings
+AUTH_TOKEN_TTL = dynamic_setting("auth.token_ttl", int, default=60 * 60 * 24)
+
 
 # utils
+def _pg_enum_values(enum_type: type[PGEnumMixin]) -> list[str]:
+    return [value for value in enum_lookup(enum_type) if value is not None]
+
+
 class PG_ENUM(ENUM):
     def __init__(self, *args, **kwargs):
         if len(args) == 1 and issubclass(args[0], PGEnumMixin):
             _enum = args[0]
-            kwargs["values_callable"] = lambda obj: [e.value for e in obj]
+            kwargs["values_callable"] = _pg_enum_values
             kwargs["name"] = _enum.__pg_name__
         super().__init__(*args, **kwargs)
 
+    def result_processor(self, dialect, coltype):
+        if self.enum_class is None or not issubclass(self.enum_class, PGEnumMixin):
+            return super().result_processor(dialect, coltype)
+        # skip per value Enum._object_value_for_elem call - decode with shared dict lookup
+        lookup = enum_lookup(self.enum_class).__getitem__
+        parent_processor = super(sa_types.Enum, self).result_processor(dialect, coltype)
+        if parent_processor is None:
+            return lookup
+        return lambda value: lookup(parent_processor(value))
+
 
 # admin
 class Base(ResponseEncodableMixin, TimeMarksMixinTZ, DeclarativeBase):
@@ -110,21 +137,64 @@ class AccessToken(ResponseEncodableMixin, TimeMarksMixinTZ, DeclarativeBase):
     # relations
     user: Mapped[AbstractUser] = relationship()
 
+    # JWT expiry of generated token, not stored - row time_expire is lifetime of refresh token
+    _access_time_expire = None
+
     # methods
+    @property
+    def access_time_expire(self) -> datetime.datetime:
+        return self._access_time_expire or self.time_expire
+
     @classmethod
     def generate(cls, user: AbstractUser) -> Self:
-        # move ttl to configs
-        ttl = 60 * 60 * 24
+        ttl = AUTH_TOKEN_TTL.value
 
         result = AccessToken()
         result.user = user
 
         result.time_expire = tz_now() + relativedelta(seconds=ttl)
-        result.access_token = secrets.token_urlsafe(64)
         result.refresh_token = secrets.token_urlsafe(64)
 
+        if access_token_mode() == AccessTokenMode.JWT:
+            # stateless short-lived access token, row keeps refresh token only
+            result.access_token, result._access_time_expire = jwt_encode_access_token(
+                user_id=user.user_id,
+                role=user.role,
+                ttl=settings.LAMB_AUTH_JWT_ACCESS_TOKEN_TTL,
+            )
+        else:
+            result.access_token = secrets.token_urlsafe(64)
+
         return result
 
+    @classmethod
+    def validate(cls, session: Session, access_token: str) -> AccessClaims:
+        """Validates access token and returns claims of token owner
+
+        In JWT mode check performed locally without database access
+        """
+        if access_token_mode() == AccessTokenMode.JWT:
+            return jwt_decode_access_token(access_token)
+
+        # single query for token and owner role
+        db_token = session.execute(
+            select(cls.user_id, cls.time_expire, cls.time_created, AbstractUser.role)
+            .join(AbstractUser, AbstractUser.user_id == cls.user_id)
+            .where(cls.access_token == access_token)
+        ).one_or_none()
+        if db_token is None:
+            raise exc.AuthTokenInvalidError
+        if db_token.time_expire <= tz_now():
+            raise exc.AuthTokenExpiredError
+
+        return AccessClaims(
+            user_id=db_token.user_id,
+            role=db_token.role,
+            time_expire=db_token.time_expire,
+            jti=access_token,
+            time_issued=db_token.time_created,
+        )
+
     @classmethod
     def response_attributes(cls) -> list[Any]:
         return [
@@ -136,6 +206,12 @@ class AccessToken(ResponseEncodableMixin, TimeMarksMixinTZ, DeclarativeBase):
             cls.user_id,
         ]
 
+    def response_encode(self, request=None) -> dict:
+        result = super().response_encode(request)
+        result["time_expire"] = self.access_time_expire
+        result["refresh_time_expire"] = self.time_expire
+        return result
+
 
 class Admin(AbstractUser):
     __tablename__ = "role_admin"
@@ -152,10 +228,14 @@ class UserEvent(Base):
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey(AbstractUser.user_id, onupdate="CASCADE", ondelete="CASCADE"))
     event_code: Mapped[UserEventCode] = mapped_column(IntStrEnumType(enum_type=UserEventCode, impl_type=SMALLINT))
     context: Mapped[jsonb] = mapped_column(default={}, server_default=text("'{}'::JSONB"))
+    # writer transaction, events are consumed by api.rollups in (xact_id, event_id) order
+    xact_id: Mapped[int_b] = mapped_column(server_default=text("pg_current_xact_id()::TEXT::BIGINT"))
 
     # relations
     user: Mapped[AbstractUser] = relationship(lazy="selectin", foreign_keys=[user_id])
 
+    __table_args__ = (Index("role_user_event_xact_id_idx", xact_id, event_id),)
+
     # methods
     def response_encode(self, request=None) -> dict:
         result = super().response_encode(request)
@@ -163,6 +243,7 @@ class UserEvent(Base):
         result.pop("user_id")
         result.pop("context")
         result.pop("event_code")
+        result.pop("xact_id", None)
 
         if self.user is None:
             initiator = None
@@ -192,3 +273,44 @@ class Operator(AbstractUser):
     operator_id: Mapped[uuid_pk] = mapped_column(
         ForeignKey(AbstractUser.user_id, onupdate="CASCADE", ondelete="CASCADE")
     )
+
+
+# rollups
+class UserEventDaily(ResponseEncodableMixin, DeclarativeBase):
+    """Counters of user events per day and code, maintained incrementally by api.rollups"""
+
+    __tablename__ = "role_user_event_daily"
+
+    # columns
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey(AbstractUser.user_id, onupdate="CASCADE", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[datetime.date] = mapped_column(primary_key=True)
+    event_code: Mapped[UserEventCode] = mapped_column(
+        IntStrEnumType(enum_type=UserEventCode, impl_type=SMALLINT), primary_key=True
+    )
+    event_count: Mapped[int_b]
+
+
+class RollupState(DeclarativeBase):
+    __tablename__ = "app_rollup_state"
+
+    # columns
+    name: Mapped[str_v] = mapped_column(primary_key=True)
+    last_xact_id: Mapped[int_b]
+    last_event_id: Mapped[int_b]
+
+
+# tasks
+class TaskOutbox(Base):
+    __tablename__ = "app_task_outbox"
+
+    # columns
+    outbox_id: Mapped[int_b] = mapped_column(Identity(always=True), primary_key=True)
+    task_id: Mapped[uuid.UUID] = mapped_column(default=uuid.uuid4)
+    task_name: Mapped[str_v]
+    queue: Mapped[str_v]
+    args: Mapped[jsonb] = mapped_column(default=[], server_default=text("'[]'::JSONB"))
+    kwargs: Mapped[jsonb] = mapped_column(default={}, server_default=text("'{}'::JSONB"))
+    countdown: Mapped[int | None]
+    expires: Mapped[int | None]
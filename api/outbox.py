@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+from typing import Any
+
+from celery import Task
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from api.models import TaskOutbox
+from core.celery_messages import redis_task_message
+from core.utils import redis_client
+from {{project_name}}.celery_config import CeleryQueues, celery_app
+
+__all__ = ["outbox_enqueue", "outbox_relay"]
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_enqueue(
+    session: Session,
+    task: Task,
+    args: list | tuple | None = None,
+    kwargs: dict[str, Any] | None = None,
+    queue: str | None = None,
+    countdown: int | None = None,
+    expires: int | None = None,
+) -> TaskOutbox:
+    """Stores task in outbox as part of session transaction - task is published only if transaction commits
+
+    Both countdown and expires are counted from enqueue time, so relay delay does not shift the schedule.
+    """
+    queue = queue or getattr(task, "queue", None) or CeleryQueues.default
+    record = TaskOutbox(
+        task_name=task.name,
+        queue=queue.value if isinstance(queue, CeleryQueues) else queue,
+        args=list(args or []),
+        kwargs=kwargs or {},
+        countdown=countdown,
+        expires=expires,
+    )
+    session.add(record)
+    return record
+
+
+def outbox_relay(session: Session, limit: int = 1000) -> int:
+    """Publishes one batch of outbox rows to broker and removes them
+
+    Rows claimed with FOR UPDATE SKIP LOCKED so several relays could work in parallel. Delivery is
+    at-least-once: if commit fails after publish rows stay in outbox and will be sent again.
+    """
+    rows = (
+        session.execute(
+            select(TaskOutbox).order_by(TaskOutbox.outbox_id).limit(limit).with_for_update(skip_locked=True)
+        )
+        .scalars()
+        .all()
+    )
+    if not rows:
+        session.rollback()
+        return 0
+
+    pipeline = redis_client("broker").pipeline(transaction=False)
+    for row in rows:
+        key, message = redis_task_message(
+            celery_app,
+            task_name=row.task_name,
+            queue=row.queue,
+            args=row.args,
+            kwargs=row.kwargs,
+            task_id=str(row.task_id),
+            eta=row.time_created + timedelta(seconds=row.countdown) if row.countdown else None,
+            expires=row.time_created + timedelta(seconds=row.expires) if row.expires else None,
+        )
+        pipeline.lpush(key, message)
+    pipeline.execute()
+
+    session.execute(delete(TaskOutbox).where(TaskOutbox.outbox_id.in_([r.outbox_id for r in rows])))
+    session.commit()
+    return len(rows)
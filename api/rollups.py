@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import collections
+import uuid
+from datetime import date, timedelta
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from lamb.utils import tz_now
+
+from api.models import RollupState, UserEvent, UserEventDaily
+
+__all__ = ["rollup_user_events", "user_event_summary"]
+
+_USER_EVENTS = "user_events"
+
+
+def rollup_user_events(session: Session, limit: int | None = None) -> int:
+    """Adds one batch of events past high-water mark to daily counters, returns number of consumed events
+
+    Events are consumed in (xact_id, event_id) order and only from transactions older than xmin of current
+    snapshot. Those transactions are all finished, so no event could appear behind the mark later, unlike
+    identity order where running transactions hold lower values. Counters and mark are changed in session
+    transaction and caller commits, so every event is counted once. Mark row is locked, concurrent rollups wait
+    for each other. Long running transactions anywhere in cluster hold the batch back.
+    """
+    limit = limit or settings.LAMB_USER_EVENT_ROLLUP_BATCH_SIZE
+    session.execute(
+        insert(RollupState).values(name=_USER_EVENTS, last_xact_id=0, last_event_id=0).on_conflict_do_nothing()
+    )
+    state = session.execute(select(RollupState).where(RollupState.name == _USER_EVENTS).with_for_update()).scalar_one()
+    horizon = session.scalar(text("SELECT pg_snapshot_xmin(pg_current_snapshot())::TEXT::BIGINT"))
+
+    rows = session.execute(
+        select(UserEvent.xact_id, UserEvent.event_id, UserEvent.user_id, UserEvent.event_code, UserEvent.time_created)
+        .where(
+            tuple_(UserEvent.xact_id, UserEvent.event_id) > (state.last_xact_id, state.last_event_id),
+            UserEvent.xact_id < horizon,
+        )
+        .order_by(UserEvent.xact_id, UserEvent.event_id)
+        .limit(limit)
+    ).all()
+
+    tz = ZoneInfo(settings.LAMB_USER_EVENT_ROLLUP_TIME_ZONE)
+    counts: collections.Counter[tuple[uuid.UUID, date, Any]] = collections.Counter()
+    for row in rows:
+        counts[(row.user_id, row.time_created.astimezone(tz).date(), row.event_code)] += 1
+    if rows:
+        state.last_xact_id, state.last_event_id = rows[-1].xact_id, rows[-1].event_id
+
+    if counts:
+        statement = insert(UserEventDaily)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=[UserEventDaily.user_id, UserEventDaily.day, UserEventDaily.event_code],
+                set_={"event_count": UserEventDaily.event_count + statement.excluded["event_count"]},
+            ),
+            [
+                {"user_id": user_id, "day": day, "event_code": event_code, "event_count": count}
+                for (user_id, day, event_code), count in counts.items()
+            ],
+        )
+    return len(rows)
+
+
+def user_event_summary(session: Session, user_id: uuid.UUID, days: int) -> dict[str, Any]:
+    """Daily and total counts of user events by code for last days, read by primary key range of rollup"""
+    tz = ZoneInfo(settings.LAMB_USER_EVENT_ROLLUP_TIME_ZONE)
+    since = tz_now().astimezone(tz).date() - timedelta(days=days - 1)
+    rows = session.execute(
+        select(UserEventDaily.day, UserEventDaily.event_code, UserEventDaily.event_count)
+        .where(UserEventDaily.user_id == user_id, UserEventDaily.day >= since)
+        .order_by(UserEventDaily.day.desc())
+    ).all()
+
+    by_day: dict[date, dict[int, int]] = {}
+    totals: collections.Counter[int] = collections.Counter()
+    for day, event_code, count in rows:
+        by_day.setdefault(day, {})[event_code.value] = count
+        totals[event_code.value] += count
+
+    return {
+        "user_id": user_id,
+        "since": since,
+        "time_zone": settings.LAMB_USER_EVENT_ROLLUP_TIME_ZONE,
+        "totals": dict(totals),
+        "days": [{"day": day, "counts": counts} for day, counts in by_day.items()],
+    }
@@ -1,8 +1,50 @@
+from __future__ import annotations
+
+import dataclasses
+import json
 import logging
+import random
+import smtplib
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from celery import group
+from django.conf import settings
+from sqlalchemy import Text, func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlalchemy.orm import InstrumentedAttribute, Session
+
+from lamb.db.session import lamb_db_session_maker
 
-from {{project_name}}.celery_config import CeleryQueues, celery_app
+from api.models import UserEvent
+from api.rollups import rollup_user_events
+from core.mail import (
+    MailConnectionError,
+    MailMessage,
+    MailTransientError,
+    mail_queue_ack,
+    mail_queue_claim,
+    mail_queue_push,
+    mail_queue_recover,
+    mail_queue_release,
+    mailer,
+)
+from core.utils import redis_client
+from {{project_name}}.celery_config import CeleryQueues, celery_app, periodic_task
 
-__all__ = ["some_task"]
+__all__ = [
+    "some_task",
+    "email_drain",
+    "send_email",
+    "chunked_job",
+    "chunked_map",
+    "chunked_map_chunk",
+    "chunked_map_progress",
+    "backfill_user_event_context",
+    "user_event_rollup",
+]
 
 
 logger = logging.getLogger(__name__)
@@ -11,3 +53,278 @@ logger = logging.getLogger(__name__)
 @celery_app.task(queue=CeleryQueues.default, bind=True, ignore_result=True)
 def some_task(_: celery_app.Task):
     logger.debug("Some task")
+
+
+# email
+_EMAIL_DRAIN_SCHEDULED_KEY = "mail:drain:scheduled"
+
+
+def send_email(to: list[str], subject: str, body: str, html: str | None = None, from_email: str | None = None):
+    """Puts message into mail queue and makes sure drain task is scheduled"""
+    mail_queue_push(MailMessage(to=to, subject=subject, body=body, html=html, from_email=from_email))
+    if redis_client().set(_EMAIL_DRAIN_SCHEDULED_KEY, 1, nx=True, ex=60):
+        email_drain.apply_async()
+
+
+@celery_app.task(queue=CeleryQueues.email, bind=True, ignore_result=True, max_retries=None)
+def email_drain(self: celery_app.Task):
+    # new messages pushed from now on schedule next drain
+    redis_client().delete(_EMAIL_DRAIN_SCHEDULED_KEY)
+    if recovered := mail_queue_recover():
+        logger.warning(f"Email drain recovered {recovered} messages of crashed drain")
+
+    # claimed batch is kept in redis until each message is acked, so crash could only send message twice
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + settings.LAMB_SMTP_DRAIN_TIME_LIMIT
+    sent = failed = 0
+    while time.monotonic() < deadline:
+        batch = mail_queue_claim(owner, settings.LAMB_SMTP_BATCH_SIZE)
+        if not batch:
+            break
+
+        for index, message in enumerate(batch):
+            try:
+                mailer().send(message)
+                sent += 1
+            except MailTransientError as e:
+                retry = batch[index:]
+                if not isinstance(e, MailConnectionError):
+                    # provider refused this message for now - count attempt, connection failures are not counted
+                    message.attempt += 1
+                    if message.attempt >= settings.LAMB_SMTP_MAX_ATTEMPTS:
+                        logger.error(f"Email to {message.to} dropped after {message.attempt} attempts: {e}")
+                        retry = batch[index + 1 :]
+                # return rest of batch and retry later with jitter
+                mail_queue_release(owner, *retry)
+                countdown = min(2**self.request.retries, 300) * (0.5 + random.random())
+                logger.warning(f"Email delivery failed: {e}, sent={sent}, retry in {countdown:.1f}s")
+                raise self.retry(countdown=countdown) from e
+            except smtplib.SMTPException as e:
+                failed += 1
+                logger.error(f"Email to {message.to} rejected: {e}")
+            mail_queue_ack(owner)
+    else:
+        # time limit reached with messages left
+        email_drain.apply_async()
+
+    logger.info(f"Email drain finished: sent={sent}, rejected={failed}")
+
+
+# chunked maintenance jobs
+_CHUNK_MAP_KEY = "chunkmap:{run_id}:{part}"
+_CHUNK_MAP_TTL = 7 * 24 * 3600
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _ChunkedJob:
+    name: str
+    column: InstrumentedAttribute
+    handler: Callable[[Session, Any, Any], int]
+    chunk_size: int
+
+
+_chunked_jobs: dict[str, _ChunkedJob] = {}
+
+
+def chunked_job(column: InstrumentedAttribute, chunk_size: int = 10_000, name: str | None = None) -> Callable:
+    """Registers handler of one key range for chunked_map
+
+    Column should be indexed integer or uuid key of the table. Handler receives session and bounds of
+    range ``after < column <= upto`` (after is None for the first chunk) and returns number of processed
+    rows, transaction is committed after it returns. Chunk could be executed again after crash or retry,
+    so handler should be idempotent.
+
+        @chunked_job(UserEvent.event_id, chunk_size=50_000)
+        def backfill_event_context(session, after, upto) -> int:
+            ...
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        job = _ChunkedJob(name=name or handler.__name__, column=column, handler=handler, chunk_size=chunk_size)
+        _chunked_jobs[job.name] = job
+        return handler
+
+    return decorator
+
+
+def _chunk_bounds(session: Session, job: _ChunkedJob) -> list[tuple[Any, Any]]:
+    # single ordered pass over index: every chunk_size-th key closes a chunk, max key closes the last one
+    column = job.column
+    numbered = select(column.label("key"), func.row_number().over(order_by=column).label("n")).subquery()
+    uppers = list(
+        session.execute(select(numbered.c.key).where(numbered.c.n % job.chunk_size == 0).order_by(numbered.c.key))
+        .scalars()
+        .all()
+    )
+    last = session.execute(select(func.max(column))).scalar()
+    if last is None:
+        return []
+    if not uppers or uppers[-1] != last:
+        uppers.append(last)
+    return list(zip([None, *uppers[:-1]], uppers, strict=True))
+
+
+def _chunk_key_value(job: _ChunkedJob, value: Any) -> Any:
+    return None if value is None else job.column.type.python_type(value)
+
+
+def chunked_map_progress(run_id: str) -> dict[str, Any]:
+    """Returns checkpoint state of chunked map run: job, total/done/failed chunks, processed rows, timings"""
+    r = redis_client()
+    pipeline = r.pipeline(transaction=False)
+    pipeline.hmget(_CHUNK_MAP_KEY.format(run_id=run_id, part="meta"), "job", "total", "processed", "seconds", "started")
+    pipeline.scard(_CHUNK_MAP_KEY.format(run_id=run_id, part="done"))
+    pipeline.scard(_CHUNK_MAP_KEY.format(run_id=run_id, part="failed"))
+    (job, total, processed, seconds, started), done, failed = pipeline.execute()
+    return {
+        "job": job,
+        "total": int(total) if total is not None else None,
+        "done": done,
+        "failed": failed,
+        "processed": int(processed or 0),
+        "seconds": float(seconds or 0),
+        "started": float(started) if started is not None else None,
+    }
+
+
+@celery_app.task(queue=CeleryQueues.maintenance, bind=True, ignore_result=True)
+def chunked_map(_: celery_app.Task, job_name: str, run_id: str):
+    """Splits table of registered job into key ranges and fans them out to maintenance workers
+
+    Plan is checkpointed in redis under run_id: launching the same run_id again dispatches only chunks
+    that are not done yet, chunks failed after all retries included.
+    """
+    job = _chunked_jobs[job_name]
+    r = redis_client()
+    meta_key = _CHUNK_MAP_KEY.format(run_id=run_id, part="meta")
+    done_key = _CHUNK_MAP_KEY.format(run_id=run_id, part="done")
+
+    if (stored := r.hget(meta_key, "bounds")) is not None:
+        bounds = json.loads(stored)
+        done = {int(i) for i in r.smembers(done_key)}
+        r.delete(_CHUNK_MAP_KEY.format(run_id=run_id, part="failed"))
+        logger.info(f"Chunked map {job_name} resumed: run_id={run_id}, done={len(done)}/{len(bounds)}")
+    else:
+        session = lamb_db_session_maker()
+        try:
+            bounds = json.loads(json.dumps(_chunk_bounds(session, job), default=str))
+        finally:
+            session.close()
+        done = set()
+        r.hset(
+            meta_key,
+            mapping={
+                "job": job_name,
+                "total": len(bounds),
+                "bounds": json.dumps(bounds),
+                "processed": 0,
+                "seconds": 0,
+                "started": time.time(),
+            },
+        )
+        r.expire(meta_key, _CHUNK_MAP_TTL)
+        logger.info(f"Chunked map {job_name} planned: run_id={run_id}, chunks={len(bounds)}")
+
+    pending = [
+        chunked_map_chunk.s(job_name, run_id, index, after, upto)
+        for index, (after, upto) in enumerate(bounds)
+        if index not in done
+    ]
+    if pending:
+        group(pending).apply_async(queue=CeleryQueues.maintenance)
+
+
+@celery_app.task(queue=CeleryQueues.maintenance, bind=True, ignore_result=True, max_retries=3)
+def chunked_map_chunk(self: celery_app.Task, job_name: str, run_id: str, index: int, after: Any, upto: Any):
+    job = _chunked_jobs[job_name]
+    r = redis_client()
+    meta_key = _CHUNK_MAP_KEY.format(run_id=run_id, part="meta")
+    done_key = _CHUNK_MAP_KEY.format(run_id=run_id, part="done")
+    failed_key = _CHUNK_MAP_KEY.format(run_id=run_id, part="failed")
+    if r.sismember(done_key, index):
+        return
+
+    start = time.perf_counter()
+    session = lamb_db_session_maker()
+    try:
+        processed = job.handler(session, _chunk_key_value(job, after), _chunk_key_value(job, upto)) or 0
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        if self.request.retries < self.max_retries:
+            logger.warning(f"Chunked map {job_name} chunk {index} failed: {e}")
+            raise self.retry(exc=e, countdown=5 * 2**self.request.retries)
+        # retries exhausted - chunk is left to resume of the same run_id
+        logger.error(f"Chunked map {job_name} chunk {index} failed after {self.request.retries} retries: {e}")
+        pipeline = r.pipeline()
+        pipeline.sadd(failed_key, index)
+        pipeline.expire(failed_key, _CHUNK_MAP_TTL)
+        pipeline.execute()
+        _chunked_map_finished(job_name, run_id)
+        raise
+    finally:
+        session.close()
+
+    pipeline = r.pipeline()
+    pipeline.sadd(done_key, index)
+    pipeline.expire(done_key, _CHUNK_MAP_TTL)
+    pipeline.srem(failed_key, index)
+    pipeline.hincrby(meta_key, "processed", processed)
+    pipeline.hincrbyfloat(meta_key, "seconds", time.perf_counter() - start)
+    pipeline.execute()
+    _chunked_map_finished(job_name, run_id)
+
+
+def _chunked_map_finished(job_name: str, run_id: str):
+    # called after every chunk outcome, logs summary once all chunks are done or failed
+    progress = chunked_map_progress(run_id)
+    if progress["total"] is None or progress["done"] + progress["failed"] != progress["total"]:
+        return
+    elapsed = time.time() - progress["started"]
+    log = logger.error if progress["failed"] else logger.info
+    log(
+        f"Chunked map {job_name} finished: run_id={run_id}, chunks={progress['done']}, failed={progress['failed']}, "
+        f"rows={progress['processed']}, elapsed={elapsed:.1f}s, rows/s={progress['processed'] / max(elapsed, 1e-6):.0f}"
+    )
+
+
+# chunked jobs
+_USER_EVENT_CONTEXT_KEYS = ["subject", "comment"]
+
+
+@chunked_job(UserEvent.event_id, chunk_size=50_000)
+def backfill_user_event_context(session: Session, after: int | None, upto: int) -> int:
+    """Adds context keys read by UserEvent.response_encode to events stored without them, keeps present values"""
+    defaults = literal(json.dumps(dict.fromkeys(_USER_EVENT_CONTEXT_KEYS))).cast(JSONB)
+    query = update(UserEvent).where(
+        UserEvent.event_id <= upto, ~UserEvent.context.has_all(array(_USER_EVENT_CONTEXT_KEYS, type_=Text))
+    )
+    if after is not None:
+        query = query.where(UserEvent.event_id > after)
+    result = session.execute(
+        query.values(context=defaults.op("||")(UserEvent.context)), execution_options={"synchronize_session": False}
+    )
+    return result.rowcount
+
+
+# rollups
+@periodic_task(settings.LAMB_USER_EVENT_ROLLUP_INTERVAL)
+def user_event_rollup(_: celery_app.Task):
+    """Folds events past high-water mark into daily counters batch by batch until caught up"""
+    batch_size = settings.LAMB_USER_EVENT_ROLLUP_BATCH_SIZE
+    session = lamb_db_session_maker()
+    try:
+        total = 0
+        while True:
+            consumed = rollup_user_events(session, batch_size)
+            session.commit()
+            total += consumed
+            if consumed < batch_size:
+                break
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+    if total:
+        logger.info(f"User event rollup consumed {total} events")
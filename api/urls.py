@@ -1,12 +1,31 @@
 from django.urls import re_path
 
-from api.views import HandbooksView, PingView
+from api.views import (
+    FileDownloadView,
+    FilePresignView,
+    FileUploadView,
+    HandbooksView,
+    MetricsView,
+    PingView,
+    ProfileView,
+    ReadinessView,
+    UserActivityView,
+)
 
 app_name = "api"
 
 urlpatterns = [
     # main
     re_path(r"^configs/?$", HandbooksView, name="configs"),
+    re_path(r"^users/(?P<user_id>[0-9a-f-]{36})/activity/?$", UserActivityView, name="user_activity"),
+    # files
+    re_path(r"^files/?$", FileUploadView, name="files_upload"),
+    re_path(r"^files/presign/?$", FilePresignView, name="files_presign"),
+    re_path(r"^files/(?P<key>uploads/[0-9a-f-]{36}/[0-9a-f-]{36}/[^/]+)$", FileDownloadView, name="files_download"),
     # healthcheck
     re_path(r"^ping/?$", PingView, name="ping"),
+    re_path(r"^ready/?$", ReadinessView, name="ready"),
+    re_path(r"^metrics/?$", MetricsView, name="metrics"),
+    # debug
+    re_path(r"^debug/profile/?$", ProfileView, name="debug_profile"),
 ]
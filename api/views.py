@@ -1,16 +1,41 @@
 from __future__ import annotations
 
+import asyncio
+import ipaddress
+import uuid
+from collections.abc import AsyncIterator, Iterator
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST
 
+import lamb.exc as exc
+from lamb.json import JsonEncoder
 from lamb.rest.decorators import a_rest_allowed_http_methods
 from lamb.rest.rest_view import RestView
-from lamb.utils import LambRequest
+from lamb.utils import LambRequest, dpath_value, parse_body_as_json
+from lamb.utils.validators import validate_length
 
+from api.auth import request_claims
+from api.rollups import user_event_summary
+from core.coalesce import public_request_key, single_flight
 from core.constants import UserRole
+from core.dynamic_config import dynamic_setting
+from core.health import health_monitor
+from core.metrics import collect_metrics
+from core.profiling import load_request_profile, profile_broadcast, profile_results, sample_process
+from core.s3 import s3_presigned_url, s3_stream_download, s3_stream_upload
+from core.tokens import AccessClaims
+
+# dynamic settings
+HANDBOOK_SOME_OTHER_CONFIG = dynamic_setting("handbook.some_other_config", int, default=10)
 
 
 @a_rest_allowed_http_methods(["GET"])
 class HandbooksView(RestView):
+    @single_flight(key=public_request_key, shared=True)
     async def get(self, _: LambRequest):
         enums = {"user_roles": UserRole}
 
@@ -19,12 +44,206 @@ class HandbooksView(RestView):
             result[key] = [m.handbook_encode() for m in _enum if m.handbook_encode() is not None]
 
         result["main"] = {
-            "some_other_config": 10,
+            "some_other_config": HANDBOOK_SOME_OTHER_CONFIG.value,
         }
         return result
 
 
+@a_rest_allowed_http_methods(["GET"])
+class UserActivityView(RestView):
+    """Daily counts of user events by code, served from rollup table updated by user_event_rollup task"""
+
+    async def get(self, request: LambRequest, user_id: str | uuid.UUID):
+        days = dpath_value(request.GET, "days", int, default=30)
+        if not 0 < days <= settings.LAMB_USER_EVENT_ROLLUP_MAX_DAYS:
+            raise exc.InvalidParamValueError(f"days should be in (0, {settings.LAMB_USER_EVENT_ROLLUP_MAX_DAYS}]")
+        try:
+            user_id = uuid.UUID(user_id)
+        except ValueError as e:
+            raise exc.InvalidParamValueError(f"Invalid user_id: {user_id}") from e
+        return await sync_to_async(self._summary)(request, user_id, days)
+
+    @staticmethod
+    def _summary(request: LambRequest, user_id: uuid.UUID, days: int) -> dict:
+        # activity of other users looks like missing one
+        claims = request_claims(request)
+        if claims.user_id != user_id and claims.role != UserRole.ADMIN:
+            raise exc.NotExistError("User not found")
+        return user_event_summary(request.lamb_db_session, user_id, days)
+
+
 @a_rest_allowed_http_methods(["GET"])
 class PingView(RestView):
     async def get(self, _: LambRequest):
         return {"response": "pong", "version": settings.LAMB_APP_VERSION}
+
+
+@a_rest_allowed_http_methods(["GET"])
+class ReadinessView(RestView):
+    async def get(self, _: LambRequest):
+        results, age = health_monitor().snapshot()
+        ready = bool(results) and all(r.ok for r in results if r.critical)
+        result = {
+            "ready": ready,
+            "version": settings.LAMB_APP_VERSION,
+            "age": round(age, 3) if results else None,
+            "probes": {
+                r.name: {"ok": r.ok, "critical": r.critical, "latency_ms": r.latency_ms, "error": r.error}
+                for r in results
+            },
+        }
+        return JsonResponse(result, status=200 if ready else 503, encoder=JsonEncoder)
+
+
+def _internal_request(request: LambRequest) -> bool:
+    if "HTTP_X_FORWARDED_FOR" in request.META:
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(n) for n in settings.LAMB_METRICS_ALLOWED_NETWORKS)
+
+
+@a_rest_allowed_http_methods(["GET"])
+class MetricsView(RestView):
+    """Prometheus exposition, available in god mode or to direct requests from LAMB_METRICS_ALLOWED_NETWORKS"""
+
+    async def get(self, request: LambRequest):
+        if not settings.LAMB_APP_GOD_MODE and not _internal_request(request):
+            raise exc.NotExistError
+        return HttpResponse(collect_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+@a_rest_allowed_http_methods(["GET", "POST"])
+class ProfileView(RestView):
+    """Sampling profiler of live workers, available only in god mode
+
+    POST samples current worker (target=self) or every process listening for broadcasts (web, celery, all).
+    GET returns profile of request sent with profiling header by its xray, or broadcast result by request_id.
+    Responses are collapsed stacks ready for flamegraph.pl or speedscope.
+    """
+
+    async def get(self, request: LambRequest):
+        if not settings.LAMB_APP_GOD_MODE:
+            raise exc.NotExistError
+        if (request_id := dpath_value(request.GET, "request_id", str, default=None)) is not None:
+            collapsed = await sync_to_async(profile_results, thread_sensitive=False)(request_id)
+        else:
+            xray = dpath_value(request.GET, "xray", str, transform=validate_length)
+            collapsed = await sync_to_async(load_request_profile, thread_sensitive=False)(xray)
+        if not collapsed:
+            raise exc.NotExistError("Profile not found")
+        return HttpResponse(collapsed, content_type="text/plain")
+
+    async def post(self, request: LambRequest):
+        if not settings.LAMB_APP_GOD_MODE:
+            raise exc.NotExistError
+        data = parse_body_as_json(request)
+        target = dpath_value(data, "target", str, default="self")
+        seconds = dpath_value(data, "seconds", float, default=5.0)
+        interval = dpath_value(data, "interval", float, default=settings.LAMB_PROFILING_INTERVAL)
+        if not 0 < seconds <= settings.LAMB_PROFILING_MAX_SECONDS:
+            raise exc.InvalidParamValueError(f"seconds should be in (0, {settings.LAMB_PROFILING_MAX_SECONDS}]")
+        if interval < 0.001:
+            raise exc.InvalidParamValueError("interval should be at least 0.001")
+
+        if target == "self":
+            collapsed = await sync_to_async(sample_process, thread_sensitive=False)(seconds, interval)
+            return HttpResponse(collapsed, content_type="text/plain")
+        if target not in ("web", "celery", "all"):
+            raise exc.InvalidParamValueError(f"Unknown profile target: {target}")
+
+        request_id, receivers = await sync_to_async(profile_broadcast, thread_sensitive=False)(
+            target, seconds, interval
+        )
+        if not receivers:
+            raise exc.NotExistError("No process listens for profile requests, check LAMB_PROFILING_ENABLED")
+        await asyncio.sleep(seconds + 1.0)
+        collapsed = await sync_to_async(profile_results, thread_sensitive=False)(request_id)
+        response = HttpResponse(collapsed, content_type="text/plain")
+        response.headers["X-Lamb-Profile-Id"] = request_id
+        return response
+
+
+# files
+def _upload_key(owner_id: uuid.UUID, filename: str) -> str:
+    filename = filename.replace("/", "_")
+    return f"uploads/{owner_id}/{uuid.uuid4()}/{filename}"
+
+
+def _check_key_access(claims: AccessClaims, key: str):
+    # objects are scoped by owner segment of key, foreign keys look like missing ones
+    owner_id = key.split("/", 2)[1]
+    if owner_id != str(claims.user_id) and claims.role != UserRole.ADMIN:
+        raise exc.NotExistError("File not found")
+
+
+async def _aiter_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    # pull chunks from blocking S3 body one by one instead of buffering whole object
+    sentinel = object()
+    while (chunk := await sync_to_async(next, thread_sensitive=False)(chunks, sentinel)) is not sentinel:
+        yield chunk
+
+
+@a_rest_allowed_http_methods(["POST"])
+class FileUploadView(RestView):
+    """Uploads raw request body to S3 multipart upload in parts
+
+    Under WSGI body is read from socket part by part. Under ASGI Django handler spools whole body into
+    SpooledTemporaryFile (disk beyond FILE_UPLOAD_MAX_MEMORY_SIZE) before view is called, so memory stays
+    bounded but upload to S3 starts only after client finished sending.
+    """
+
+    async def post(self, request: LambRequest):
+        claims = await sync_to_async(request_claims)(request)
+        filename = dpath_value(request.GET, "filename", str, transform=validate_length, default="file")
+        obj = await sync_to_async(s3_stream_upload, thread_sensitive=False)(
+            request,
+            key=_upload_key(claims.user_id, filename),
+            content_type=request.META.get("CONTENT_TYPE") or None,
+        )
+        return {"key": obj.key, "size": obj.size, "url": s3_presigned_url(obj.key)}
+
+
+@a_rest_allowed_http_methods(["POST"])
+class FilePresignView(RestView):
+    """Issues presigned URLs so client could upload and download object directly"""
+
+    async def post(self, request: LambRequest):
+        claims = await sync_to_async(request_claims)(request)
+        data = parse_body_as_json(request)
+        filename = dpath_value(data, "filename", str, transform=validate_length, default="file")
+        content_type = dpath_value(data, "content_type", str, default=None)
+        key = _upload_key(claims.user_id, filename)
+        return {
+            "key": key,
+            "upload_url": s3_presigned_url(key, method="PUT", content_type=content_type),
+            "download_url": s3_presigned_url(key, method="GET"),
+            "expires": settings.LAMB_S3_PRESIGN_EXPIRES,
+        }
+
+
+@a_rest_allowed_http_methods(["GET"])
+class FileDownloadView(RestView):
+    """Streams object or requested byte range from S3, available to owner and admins"""
+
+    async def get(self, request: LambRequest, key: str):
+        claims = await sync_to_async(request_claims)(request)
+        _check_key_access(claims, key)
+        byte_range = request.headers.get("Range")
+        obj, chunks = await sync_to_async(s3_stream_download, thread_sensitive=False)(key, byte_range=byte_range)
+
+        content = _aiter_chunks(chunks) if isinstance(request, ASGIRequest) else chunks
+        response = StreamingHttpResponse(
+            content,
+            status=206 if obj.content_range else 200,
+            content_type=obj.content_type or "application/octet-stream",
+        )
+        response["Content-Length"] = str(obj.size)
+        response["Accept-Ranges"] = "bytes"
+        if obj.content_range:
+            response["Content-Range"] = obj.content_range
+        if obj.etag:
+            response["ETag"] = obj.etag
+        return response
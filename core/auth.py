@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+
+from django.conf import settings
+
+from core.constants import AccessTokenMode
+from core.tokens import access_token_mode
+from core.utils import TTLCache
+
+__all__ = ["token_format_valid", "token_rejected", "token_rejection", "negative_cache"]
+
+# DB tokens are secrets.token_urlsafe(64), JWT - three base64url segments
+_TOKEN_FORMAT = {
+    AccessTokenMode.DB: re.compile(r"[A-Za-z0-9_-]{86}"),
+    AccessTokenMode.JWT: re.compile(r"[A-Za-z0-9_-]{8,512}\.[A-Za-z0-9_-]{8,1024}\.[A-Za-z0-9_-]{16,512}"),
+}
+
+
+def token_format_valid(token: str) -> bool:
+    return _TOKEN_FORMAT[access_token_mode()].fullmatch(token) is not None
+
+
+def _token_key(token: str) -> bytes:
+    # cache keeps digests only - no raw tokens in worker memory, fixed entry size
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+_cache: TTLCache | None = None
+_cache_lock = threading.Lock()
+
+
+def negative_cache() -> TTLCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTLCache(settings.LAMB_AUTH_NEGATIVE_CACHE_SIZE, settings.LAMB_AUTH_NEGATIVE_CACHE_TTL)
+    return _cache
+
+
+def token_rejected(token: str, reason: str):
+    """Remembers token rejected by full validation, reason is "invalid" or "expired" """
+    negative_cache().set(_token_key(token), reason)
+
+
+def token_rejection(token: str) -> str | None:
+    """Reason of recent rejection of token in this worker, None if unknown"""
+    return negative_cache().get(_token_key(token))
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import contextlib
+import functools
+import logging
+import time
+from collections.abc import Callable, Iterator
+
+import redis
+from celery import Task
+from celery.beat import PersistentScheduler, ScheduleEntry
+from django.conf import settings
+from redis.exceptions import LockError
+
+from core.metrics import BEAT_DISPATCH_DELAY, BEAT_LATE_RUNS, BEAT_SKIPPED_RUNS
+from core.utils import redis_client
+
+__all__ = ["LeaderScheduler", "singleton_lock", "singleton_task"]
+
+logger = logging.getLogger(__name__)
+
+_LEASE_KEY = "beat:leader"
+_SINGLETON_KEY = "beat:singleton:{name}"
+
+
+class LeaderScheduler(PersistentScheduler):
+    """Beat scheduler that dispatches only while holding lease in redis
+
+    Several beat instances could run for HA: all of them walk the schedule, but only lease owner sends
+    messages. Standby instances advance their entries in step with the leader, so on failover no burst
+    of "missed" runs is produced. Lease is renewed every third of its ttl.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._lease_ttl = settings.LAMB_BEAT_LEASE_TTL
+        self._lease = redis_client("cache").lock(_LEASE_KEY, timeout=self._lease_ttl, thread_local=False)
+        self._lease_checked = 0.0
+        self._leader = False
+        super().__init__(*args, **kwargs)
+
+    def _refresh_lease(self):
+        was_leader = self._leader
+        try:
+            if self._leader:
+                self._lease.reacquire()
+            else:
+                self._leader = self._lease.acquire(blocking=False)
+        except LockError:
+            self._leader = False
+        except redis.RedisError as e:
+            # leadership could not be proven - stay silent rather than risk duplicate dispatch
+            logger.warning(f"Beat lease check failed: {e}")
+            self._leader = False
+        self._lease_checked = time.monotonic()
+
+        if self._leader != was_leader:
+            logger.info(f"Beat lease {'acquired' if self._leader else 'lost'}")
+
+    def tick(self, *args, **kwargs) -> float:
+        interval = self._lease_ttl / 3
+        if time.monotonic() - self._lease_checked >= interval:
+            self._refresh_lease()
+        return min(super().tick(*args, **kwargs), interval)
+
+    def apply_entry(self, entry: ScheduleEntry, producer=None):
+        if not self._leader:
+            logger.debug(f"Beat standby, skip dispatch: {entry.name}")
+            return
+
+        delay = max(-entry.schedule.remaining_estimate(entry.last_run_at).total_seconds(), 0.0)
+        BEAT_DISPATCH_DELAY.labels(entry.task).observe(delay)
+        if delay > settings.LAMB_BEAT_LATE_THRESHOLD:
+            BEAT_LATE_RUNS.labels(entry.task).inc()
+            logger.warning(f"Periodic task dispatched late: {entry.name}, delay={delay:.1f}s")
+        super().apply_entry(entry, producer=producer)
+
+    def close(self):
+        super().close()
+        if self._leader:
+            with contextlib.suppress(LockError, redis.RedisError):
+                self._lease.release()
+            self._leader = False
+
+
+@contextlib.contextmanager
+def singleton_lock(name: str, ttl: float) -> Iterator[bool]:
+    """Non-blocking redis lock, yields True if acquired
+
+    Lock expires after ttl even if holder died, so ttl should exceed the longest expected run.
+    """
+    lock = redis_client("cache").lock(_SINGLETON_KEY.format(name=name), timeout=ttl, thread_local=False)
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with contextlib.suppress(LockError):
+                lock.release()
+
+
+def singleton_task(func: Callable, ttl: float | None = None) -> Callable:
+    """Wraps bound task body so overlapping runs of the same task are skipped"""
+
+    @functools.wraps(func)
+    def wrapper(task: Task, *args, **kwargs):
+        with singleton_lock(task.name, ttl=ttl or settings.LAMB_BEAT_LOCK_TTL) as acquired:
+            if not acquired:
+                BEAT_SKIPPED_RUNS.labels(task.name).inc()
+                logger.warning(f"Periodic task skipped, previous run still active: {task.name}")
+                return None
+            return func(task, *args, **kwargs)
+
+    return wrapper
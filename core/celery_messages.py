@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Any
+
+from celery import Celery
+from kombu.serialization import dumps as kombu_serialize
+from kombu.utils.json import dumps as kombu_json
+
+__all__ = ["redis_task_message"]
+
+
+def redis_task_message(
+    app: Celery,
+    task_name: str,
+    queue: str,
+    args: list | tuple | None = None,
+    kwargs: dict[str, Any] | None = None,
+    task_id: str | None = None,
+    eta: datetime | None = None,
+    expires: datetime | None = None,
+) -> tuple[str, str]:
+    """Builds celery protocol v2 task message as kombu redis transport stores it
+
+    Returns redis list key and serialized envelope ready for LPUSH. Queues of this project are bound to
+    direct exchange of the same name, so routing resolves to list named as queue. Only default priority
+    supported.
+    """
+    task_id = task_id or str(uuid.uuid4())
+    headers, properties, body, _ = app.amqp.as_task_v2(
+        task_id,
+        task_name,
+        args=args or (),
+        kwargs=kwargs or {},
+        eta=eta,
+        expires=expires,
+    )
+    content_type, content_encoding, data = kombu_serialize(body, serializer="json")
+    if isinstance(data, str):
+        data = data.encode(content_encoding)
+
+    envelope = {
+        "body": base64.b64encode(data).decode(),
+        "content-encoding": content_encoding,
+        "content-type": content_type,
+        "headers": headers,
+        "properties": {
+            **properties,
+            "delivery_mode": 2,
+            "delivery_info": {"exchange": queue, "routing_key": queue},
+            "priority": 0,
+            "body_encoding": "base64",
+            "delivery_tag": str(uuid.uuid4()),
+        },
+    }
+    prefix = (app.conf.broker_transport_options or {}).get("global_keyprefix", "")
+    return f"{prefix}{queue}", kombu_json(envelope)
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import dataclasses
+import functools
+import hashlib
+import json
+import logging
+import secrets
+from collections.abc import Awaitable, Callable
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import Resolver404, resolve
+
+from lamb.utils import LambRequest
+
+from core.metrics import COALESCED_REQUESTS
+from core.utils import async_redis_client
+
+__all__ = ["single_flight", "single_flight_response", "request_key", "public_request_key"]
+
+logger = logging.getLogger(__name__)
+
+_LOCK_KEY = "coalesce:lock:{key}"
+_RESULT_KEY = "coalesce:result:{key}:{token}"
+# result marker for followers in other workers: leader failed, compute on your own
+_FAILED = ""
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.blake2b("\n".join(parts).encode(), digest_size=16).hexdigest()
+
+
+def request_key(request: LambRequest) -> str:
+    """Default key: path, query and LAMB_COALESCE_VARY_HEADERS (auth scope, language)"""
+    meta = request.META
+    return _digest(
+        request.path, meta.get("QUERY_STRING", ""), *[meta.get(h, "") for h in settings.LAMB_COALESCE_VARY_HEADERS]
+    )
+
+
+def public_request_key(request: LambRequest) -> str:
+    """Key for responses that do not depend on caller: path, query and language"""
+    meta = request.META
+    return _digest(request.path, meta.get("QUERY_STRING", ""), meta.get("HTTP_ACCEPT_LANGUAGE", ""))
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _Encoded:
+    status: int
+    headers: tuple[tuple[str, str], ...]
+    content: bytes
+
+    @classmethod
+    def from_response(cls, response: HttpResponse) -> _Encoded | None:
+        if isinstance(response, StreamingHttpResponse):
+            return None
+        return cls(response.status_code, tuple(response.headers.items()), response.content)
+
+    def response(self) -> HttpResponse:
+        # every caller gets own response object - middlewares mutate headers
+        response = HttpResponse(self.content, status=self.status)
+        for name, value in self.headers:
+            response.headers[name] = value
+        return response
+
+    def dumps(self) -> str:
+        return json.dumps([self.status, self.headers, base64.b64encode(self.content).decode()])
+
+    @classmethod
+    def loads(cls, value: str) -> _Encoded:
+        status, headers, content = json.loads(value)
+        return cls(status, tuple(tuple(h) for h in headers), base64.b64decode(content))
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future: asyncio.Future[_Encoded | None] = asyncio.get_running_loop().create_future()
+        # mark exception retrieved even if all followers were cancelled
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.waiters = 0
+
+
+# ASGI worker runs views on single event loop, so plain dict is enough
+_flights: dict[str, _Flight] = {}
+
+
+async def _execute(compute: Callable[[], Awaitable[HttpResponse]]) -> tuple[_Encoded | None, HttpResponse | None]:
+    response = await compute()
+    return _Encoded.from_response(response), response
+
+
+def _response(encoded: _Encoded | None, response: HttpResponse | None) -> HttpResponse:
+    return encoded.response() if encoded is not None else response
+
+
+async def _shared_execute(
+    name: str, key: str, compute: Callable[[], Awaitable[HttpResponse]], timeout: float
+) -> tuple[_Encoded | None, HttpResponse | None]:
+    """Cross-worker flight: owner of redis lock computes, other workers poll for its result"""
+    client = async_redis_client()
+    lock_key = _LOCK_KEY.format(key=key)
+    token = secrets.token_hex(8)
+    try:
+        owner = await client.set(lock_key, token, nx=True, px=int(timeout * 1000))
+        if not owner:
+            token = await client.get(lock_key)
+    except redis.RedisError as e:
+        logger.warning(f"Coalescing lock unavailable, executing locally: {e}")
+        return await _execute(compute)
+
+    if owner:
+        result_key = _RESULT_KEY.format(key=key, token=token)
+        encoded = None
+        try:
+            encoded, response = await _execute(compute)
+            return encoded, response
+        finally:
+            try:
+                pipeline = client.pipeline(transaction=False)
+                pipeline.set(result_key, encoded.dumps() if encoded is not None else _FAILED, px=int(timeout * 1000))
+                pipeline.eval(_RELEASE_SCRIPT, 1, lock_key, token)
+                await pipeline.execute()
+            except redis.RedisError as e:
+                logger.warning(f"Coalescing result publish failed: {e}")
+
+    if token is not None:
+        result_key = _RESULT_KEY.format(key=key, token=token)
+        loop = asyncio.get_running_loop()
+        deadline, delay = loop.time() + timeout, 0.005
+        try:
+            while loop.time() < deadline:
+                if (value := await client.get(result_key)) is not None:
+                    if value == _FAILED:
+                        break
+                    COALESCED_REQUESTS.labels(name, "shared").inc()
+                    return _Encoded.loads(value), None
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.05)
+        except redis.RedisError as e:
+            logger.warning(f"Coalescing result wait failed: {e}")
+    return await _execute(compute)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _FlightOptions:
+    name: str
+    key: Callable[[LambRequest], str]
+    max_waiters: int | None
+    shared: bool
+    shared_timeout: float | None
+
+
+def single_flight(
+    key: Callable[[LambRequest], str] | None = None,
+    max_waiters: int | None = None,
+    shared: bool = False,
+    shared_timeout: float | None = None,
+) -> Callable:
+    """Marks async GET handler of RestView for coalescing of concurrent identical requests
+
+    Coalescing is done by api.middleware.CoalesceMiddleware under ASGI, in front of response rendering: first
+    request becomes leader and passes through rest of middleware chain and view, requests with the same key
+    arriving while it runs wait for leader and receive copy of the same rendered response. Followers above
+    max_waiters per key are processed on their own. With shared=True leaders of different workers are
+    coordinated through redis lock, response is passed through redis. Leader failure is propagated to all
+    followers.
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        handler.app_single_flight = _FlightOptions(
+            name=handler.__qualname__,
+            key=key or request_key,
+            max_waiters=max_waiters,
+            shared=shared,
+            shared_timeout=shared_timeout,
+        )
+        return handler
+
+    return decorator
+
+
+@functools.lru_cache(maxsize=4096)
+def _path_flight_options(path: str) -> _FlightOptions | None:
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, "view_class", match.func)
+    return getattr(getattr(view_class, "get", None), "app_single_flight", None)
+
+
+async def single_flight_response(
+    request: LambRequest, get_response: Callable[[LambRequest], Awaitable[HttpResponse]]
+) -> HttpResponse:
+    """Response of async middleware chain, coalesced when request targets handler marked with single_flight"""
+    if not settings.LAMB_COALESCE_ENABLED or request.method != "GET":
+        return await get_response(request)
+    if (options := _path_flight_options(request.path_info)) is None:
+        return await get_response(request)
+
+    name = options.name
+    compute = functools.partial(get_response, request)
+    flight_key = f"{name}:{options.key(request)}"
+
+    if (flight := _flights.get(flight_key)) is not None:
+        if flight.waiters >= (options.max_waiters or settings.LAMB_COALESCE_MAX_WAITERS):
+            COALESCED_REQUESTS.labels(name, "overflow").inc()
+            return _response(*await _execute(compute))
+        flight.waiters += 1
+        COALESCED_REQUESTS.labels(name, "follower").inc()
+        try:
+            encoded = await asyncio.shield(flight.future)
+        except _LeaderCancelled:
+            encoded = None
+        return encoded.response() if encoded is not None else _response(*await _execute(compute))
+
+    flight = _flights[flight_key] = _Flight()
+    COALESCED_REQUESTS.labels(name, "leader").inc()
+    try:
+        if options.shared:
+            timeout = options.shared_timeout or settings.LAMB_COALESCE_SHARED_TIMEOUT
+            encoded, response = await _shared_execute(name, flight_key, compute, timeout)
+        else:
+            encoded, response = await _execute(compute)
+    except asyncio.CancelledError:
+        # client of leader disconnected - followers should not fail because of that
+        flight.future.set_exception(_LeaderCancelled())
+        raise
+    except Exception as e:
+        flight.future.set_exception(e)
+        raise
+    else:
+        flight.future.set_result(encoded)
+    finally:
+        _flights.pop(flight_key, None)
+    return _response(encoded, response)
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import enum
+import functools
 from typing import Any, TypeVar
 
 import sqlalchemy as sa
@@ -9,19 +10,54 @@ from sqlalchemy_utils.types.scalar_coercible import ScalarCoercible
 import lamb.exc as exc
 from lamb.json.mixins import ResponseEncodableMixin
 
-__all__ = ["UserRole", "UserEventCode"]
+__all__ = ["UserRole", "UserEventCode", "AccessTokenMode", "enum_lookup"]
 
 
 # utils
+class _FrozenDict(dict):
+    """Dict shared between callers, encodes as plain dict but rejects modification"""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError(f"{self.__class__.__name__} is read-only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = __ior__ = _readonly
+
+    def __reduce__(self):
+        # copies and unpickled values are ordinary dicts
+        return dict, (dict(self),)
+
+
+class _EnumLookup(dict):
+    """Database value to member map, hits are served by dict.__getitem__ without python frames"""
+
+    def __init__(self, enum_type: type[enum.Enum]):
+        super().__init__({e.value: e for e in enum_type})
+        self[None] = None
+        self.enum_type = enum_type
+
+    def __missing__(self, value):
+        raise exc.InvalidParamValueError(f"Unknown enum value: {value}")
+
+
+@functools.cache
+def enum_lookup(enum_type: type[enum.Enum]) -> _EnumLookup:
+    return _EnumLookup(enum_type)
+
+
 class _EncodeMixin(ResponseEncodableMixin):
+    # encoded forms are built once on member creation
+    _response: Any
+    _handbook: _FrozenDict
+
+    def _encode_init(self, response: Any):
+        self._response = response
+        self._handbook = _FrozenDict(id=self._value_, title=self.title)
+
     def response_encode(self, request=None) -> dict:
-        return self.value
+        return self._response
 
     def handbook_encode(self) -> dict:
-        return {
-            "id": self.value,
-            "title": self.title,
-        }
+        return self._handbook
 
 
 class _EnumMixin(_EncodeMixin):
@@ -31,21 +67,12 @@ class _EnumMixin(_EncodeMixin):
         obj = object.__new__(cls)
         obj._value_ = code
         obj.__post_init__(code, title, *args, **kwargs)
+        obj._encode_init(code)
         return obj
 
     def __post_init__(self, code, title, *args, **kwargs):
         self.title = title
 
-    def response_encode(self, request=None) -> dict:
-        return self.value
-
-    def handbook_encode(self) -> dict:
-        result = {
-            "id": self.value,
-            "title": self.title,
-        }
-        return result
-
 
 class PGEnumMixin(_EnumMixin):
     __pg_name__ = None
@@ -84,6 +111,7 @@ class IntStrEnum(_EncodeMixin, enum.Enum):
         obj._value_ = code
         obj.code = code
         obj.title = title
+        obj._encode_init(title)
         return obj
 
     @classmethod
@@ -113,13 +141,14 @@ class IntStrEnum(_EncodeMixin, enum.Enum):
 class IntStrEnumType(sa.types.TypeDecorator, ScalarCoercible):
     # meta
     impl = sa.Integer
+    cache_ok = True
 
     @property
     def python_type(self):
-        return self._enum_type
+        return self.enum_type
 
-    _enum_type: type[ET]
-    _impl_type: type[sa.types.Integer]
+    enum_type: type[ET]
+    impl_type: type[sa.types.Integer]
 
     def __init__(
         self,
@@ -129,12 +158,12 @@ class IntStrEnumType(sa.types.TypeDecorator, ScalarCoercible):
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
-        self._enum_type = enum_type
-        self._impl_type = impl_type
+        self.enum_type = enum_type
+        self.impl_type = impl_type
 
     def load_dialect_impl(self, dialect):
-        if self._impl_type is not None:
-            return dialect.type_descriptor(self._impl_type)
+        if self.impl_type is not None:
+            return dialect.type_descriptor(self.impl_type)
         else:
             return dialect.type_descriptor(self.impl)
 
@@ -148,17 +177,20 @@ class IntStrEnumType(sa.types.TypeDecorator, ScalarCoercible):
             return value
 
     def process_result_value(self, value: Any | None, dialect):
-        if value is None:
-            return None
-        try:
-            return self._enum_type(value)
-        except ValueError as e:
-            raise exc.InvalidParamValueError(f"Unknown enum value: {value}") from e
+        return enum_lookup(self.enum_type)[value]
+
+    def result_processor(self, dialect, coltype):
+        # rows are decoded by bound dict lookup instead of python call chain per value
+        lookup = enum_lookup(self.enum_type).__getitem__
+        impl_processor = self.load_dialect_impl(dialect).result_processor(dialect, coltype)
+        if impl_processor is None:
+            return lookup
+        return lambda value: lookup(impl_processor(value))
 
     def _coerce(self, value: Any | None) -> ET | None:
-        if value is not None and not isinstance(value, self._enum_type):
+        if value is not None and not isinstance(value, self.enum_type):
             try:
-                return self._enum_type(value)
+                return self.enum_type(value)
             except ValueError as e:
                 raise exc.InvalidParamValueError(f"Unknown enum value: {value}") from e
         return value
@@ -182,3 +214,10 @@ class UserEventCode(IntStrEnum):
 
     # profile
     PASSWORD_CHANGE = (101, "Смена пароля")
+
+
+# app enums
+@enum.unique
+class AccessTokenMode(str, enum.Enum):
+    DB = "DB"
+    JWT = "JWT"
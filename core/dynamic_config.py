@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import redis
+from django.conf import settings
+
+import lamb.exc as exc
+from lamb.utils import dpath_value
+
+from core.utils import redis_client
+
+__all__ = [
+    "DynamicSetting",
+    "dynamic_setting",
+    "dynamic_settings",
+    "dynamic_config_set",
+    "dynamic_config_reset",
+    "dynamic_config_preload",
+]
+
+logger = logging.getLogger(__name__)
+
+_VALUES_KEY = "dynconf:values"
+_VERSION_KEY = "dynconf:version"
+_CHANNEL = "dynconf:changed"
+
+
+class _Store:
+    """Process local snapshot of dynamic values
+
+    Snapshot dict is never mutated - reload replaces it as a whole, so readers need no lock. Listener thread
+    reloads snapshot on pub/sub notification and also compares version every poll interval, because
+    messages published while subscriber reconnects are lost.
+    """
+
+    def __init__(self):
+        self.values: dict[str, Any] = {}
+        self.version = -1
+        self._started = False
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            try:
+                self._reload()
+            except redis.RedisError as e:
+                logger.warning(f"Dynamic config load failed, defaults used: {e}")
+                self.values = {}
+            threading.Thread(target=self._listen, name="dynamic-config", daemon=True).start()
+            self._started = True
+
+    def _reload(self):
+        pipeline = redis_client().pipeline(transaction=True)
+        pipeline.get(_VERSION_KEY)
+        pipeline.hgetall(_VALUES_KEY)
+        version, raw = pipeline.execute()
+
+        values = {}
+        for key, value in raw.items():
+            try:
+                values[key] = json.loads(value)
+            except ValueError:
+                logger.warning(f"Dynamic config value is not valid json: {key}")
+        self.version = int(version or 0)
+        self.values = values
+
+    def _reload_if_changed(self):
+        if int(redis_client().get(_VERSION_KEY) or 0) != self.version:
+            self._reload()
+
+    def _listen(self):
+        backoff = 1.0
+        while True:
+            pubsub = None
+            try:
+                pubsub = redis_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_CHANNEL)
+                # catches changes made before subscription was established
+                self._reload_if_changed()
+                backoff = 1.0
+                while True:
+                    message = pubsub.get_message(timeout=settings.LAMB_DYNAMIC_CONFIG_POLL_INTERVAL)
+                    if message is None:
+                        self._reload_if_changed()
+                    elif int(message["data"]) != self.version:
+                        self._reload()
+            except (redis.RedisError, OSError, ValueError) as e:
+                logger.warning(f"Dynamic config listener failed, retry in {backoff:.0f}s: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    pubsub.close()
+
+
+_store = _Store()
+
+
+def _after_fork_in_child():
+    # listener thread does not survive fork - child starts its own on first read
+    global _store
+    _store = _Store()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class DynamicSetting:
+    """Typed runtime setting stored in redis
+
+    Value is parsed with the same rules as dpath_value and cached until snapshot changes, so read is one
+    identity check. Invalid stored value is logged and replaced with default.
+    """
+
+    __slots__ = ("key", "req_type", "transform", "default", "_cached")
+
+    def __init__(self, key: str, req_type: type, default: Any, transform: Callable | None = None):
+        self.key = key
+        self.req_type = req_type
+        self.transform = transform
+        self.default = default
+        self._cached: tuple[dict | None, Any] = (None, None)
+
+    def parse(self, value: Any) -> Any:
+        return dpath_value({"value": value}, "value", self.req_type, transform=self.transform)
+
+    @property
+    def value(self) -> Any:
+        cached = self._cached
+        if cached[0] is _store.values:
+            return cached[1]
+        return self._refresh()
+
+    def _refresh(self) -> Any:
+        _store.ensure_started()
+        values = _store.values
+        result = self.default
+        if self.key in values:
+            try:
+                result = self.parse(values[self.key])
+            except exc.ApiError as e:
+                logger.warning(f"Dynamic setting {self.key} has invalid value, default used: {e}")
+        self._cached = (values, result)
+        return result
+
+
+_registry: dict[str, DynamicSetting] = {}
+
+
+def dynamic_setting(key: str, req_type: type, default: Any, transform: Callable | None = None) -> DynamicSetting:
+    if key in _registry:
+        raise exc.ImproperlyConfiguredError(f"Dynamic setting declared twice: {key}")
+    result = _registry[key] = DynamicSetting(key, req_type, default=default, transform=transform)
+    return result
+
+
+def dynamic_settings() -> dict[str, DynamicSetting]:
+    return dict(_registry)
+
+
+def _publish(change: Callable[[redis.client.Pipeline], Any]):
+    client = redis_client()
+    pipeline = client.pipeline(transaction=True)
+    change(pipeline)
+    pipeline.incr(_VERSION_KEY)
+    version = pipeline.execute()[-1]
+    client.publish(_CHANNEL, version)
+
+
+def dynamic_config_set(key: str, value: Any):
+    """Validates value against declared setting and publishes it to all processes"""
+    if key not in _registry:
+        raise exc.InvalidParamValueError(f"Unknown dynamic setting: {key}")
+    _registry[key].parse(value)
+    _publish(lambda p: p.hset(_VALUES_KEY, key, json.dumps(value)))
+
+
+def dynamic_config_reset(key: str):
+    """Removes stored value, processes fall back to declared default"""
+    _publish(lambda p: p.hdel(_VALUES_KEY, key))
+
+
+def dynamic_config_preload():
+    """Loads snapshot and starts listener eagerly, so first request does not pay for redis round trip"""
+    _store.ensure_started()
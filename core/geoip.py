@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import dataclasses
+import functools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+import geoip2.database
+import geoip2.errors
+from django.conf import settings
+from maxminddb import MODE_MMAP
+
+__all__ = ["GeoInfo", "GeoIPService", "geoip_service"]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class GeoInfo:
+    country_code: str | None = None
+    country_name: str | None = None
+    city_name: str | None = None
+    latitude: float | None = None
+    longitude: float | None = None
+    asn: int | None = None
+    asn_org: str | None = None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _Generation:
+    """Immutable snapshot of opened readers and their cache, swapped atomically on reload"""
+
+    readers: dict[str, geoip2.database.Reader]
+    mtimes: dict[str, float]
+    lookup: functools._lru_cache_wrapper
+
+
+class GeoIPService:
+    """GeoIP2 lookups over memory mapped databases with per-IP LRU and hot reload
+
+    Databases opened in MODE_MMAP so pages live in OS page cache and shared by all workers on host.
+    Updated files should be replaced atomically (write to temp file and rename) - service checks
+    mtime not often than reload_interval seconds and switches to new readers without locking lookups.
+    """
+
+    def __init__(self, paths: dict[str, Path], cache_size: int = 65536, reload_interval: float = 60.0):
+        self._paths = {k: Path(v) for k, v in paths.items() if v is not None}
+        self._cache_size = cache_size
+        self._reload_interval = reload_interval
+        self._reload_lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._generation = self._open()
+
+    # internals
+    def _mtimes(self) -> dict[str, float]:
+        result = {}
+        for kind, path in self._paths.items():
+            try:
+                result[kind] = os.stat(path).st_mtime
+            except OSError:
+                continue
+        return result
+
+    def _open(self) -> _Generation:
+        mtimes = self._mtimes()
+        readers = {}
+        for kind in mtimes:
+            try:
+                readers[kind] = geoip2.database.Reader(str(self._paths[kind]), mode=MODE_MMAP)
+            except (OSError, ValueError) as e:
+                logger.warning(f"GeoIP database {kind} could not be opened: {e}")
+        if not readers:
+            logger.warning("GeoIP databases are not available, lookups disabled")
+
+        lookup = functools.lru_cache(maxsize=self._cache_size)(functools.partial(self._lookup_uncached, readers))
+        return _Generation(readers=readers, mtimes=mtimes, lookup=lookup)
+
+    @staticmethod
+    def _lookup_uncached(readers: dict[str, geoip2.database.Reader], ip: str) -> GeoInfo | None:
+        values = {}
+        try:
+            if (reader := readers.get("city")) is not None:
+                city = reader.city(ip)
+                values.update(
+                    country_code=city.country.iso_code,
+                    country_name=city.country.name,
+                    city_name=city.city.name,
+                    latitude=city.location.latitude,
+                    longitude=city.location.longitude,
+                )
+            elif (reader := readers.get("country")) is not None:
+                country = reader.country(ip)
+                values.update(country_code=country.country.iso_code, country_name=country.country.name)
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+        try:
+            if (reader := readers.get("asn")) is not None:
+                asn = reader.asn(ip)
+                values.update(asn=asn.autonomous_system_number, asn_org=asn.autonomous_system_organization)
+        except (geoip2.errors.AddressNotFoundError, ValueError):
+            pass
+
+        return GeoInfo(**values) if values else None
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._checked_at < self._reload_interval or not self._reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            if self._mtimes() != self._generation.mtimes:
+                logger.info("GeoIP databases changed on disk, reloading")
+                # old readers closed by GC when last in-flight lookup releases them
+                self._generation = self._open()
+        finally:
+            self._reload_lock.release()
+
+    # public
+    def lookup(self, ip: str | None) -> GeoInfo | None:
+        if not ip:
+            return None
+        self._maybe_reload()
+        return self._generation.lookup(ip)
+
+    def cache_info(self) -> functools._CacheInfo:
+        return self._generation.lookup.cache_info()
+
+
+@functools.cache
+def geoip_service() -> GeoIPService:
+    return GeoIPService(
+        paths={
+            "city": settings.LAMB_GEOIP2_DB_CITY,
+            "country": settings.LAMB_GEOIP2_DB_COUNTRY,
+            "asn": settings.LAMB_GEOIP2_DB_ASN,
+        },
+        cache_size=settings.LAMB_GEOIP_CACHE_SIZE,
+        reload_interval=settings.LAMB_GEOIP_RELOAD_INTERVAL,
+    )
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import logging
+import os
+import threading
+import time
+from collections.abc import Awaitable, Callable
+
+import redis.asyncio as aredis
+from django.conf import settings
+from sqlalchemy import text
+
+from lamb.db.session import lamb_db_session_maker
+
+from core.s3 import s3_client
+
+__all__ = ["ProbeResult", "HealthMonitor", "health_monitor"]
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class ProbeResult:
+    name: str
+    ok: bool
+    critical: bool
+    latency_ms: float
+    error: str | None = None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class _Probe:
+    name: str
+    check: Callable[[], Awaitable[None]]
+    critical: bool = True
+
+
+class HealthMonitor:
+    """Dependency probes with cached results
+
+    Readers get last snapshot without waiting. Stale snapshot triggers one refresh on background
+    thread with own event loop, where all probes run concurrently under per-probe timeout. So load on
+    dependencies limited by cache ttl regardless of how often orchestrator asks. Until first refresh
+    snapshot is empty, monitor started at worker boot normally has it ready before first request.
+    """
+
+    def __init__(self, ttl: float, timeout: float):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._pid = os.getpid()
+        self._snapshot: tuple[ProbeResult, ...] = ()
+        self._refreshed_at = 0.0
+        self._wakeup = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._thread_lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._redis: dict[str, aredis.Redis] = {}
+        self._probes = self._build_probes()
+
+    # probes
+    def _redis_client(self, key: str, url: str) -> aredis.Redis:
+        if key not in self._redis:
+            self._redis[key] = aredis.Redis.from_url(url, socket_connect_timeout=self.timeout)
+        return self._redis[key]
+
+    def _build_probes(self) -> list[_Probe]:
+        probes = []
+        for key in settings.LAMB_DB_CONFIG:
+
+            async def _db(key=key):
+                # lamb engine with configured connect options (hosts, target_session_attrs, search_path),
+                # not pooled - pooled connections are bound to event loop of requests
+                async with lamb_db_session_maker(key, pooled=False, sync=False) as session:
+                    await session.execute(text("SELECT 1"))
+
+            probes.append(_Probe(name=f"db:{key}", check=_db, critical=key == "default"))
+
+        redis_urls = {f"redis:{k}": v.url for k, v in settings.LAMB_REDIS_CONFIG.items()}
+        redis_urls["celery_broker"] = settings.LAMB_BROKER_URL
+        for name, url in redis_urls.items():
+
+            async def _redis(name=name, url=url):
+                await self._redis_client(name, url).ping()
+
+            probes.append(_Probe(name=name, check=_redis))
+
+        for key, cfg in settings.LAMB_S3_CONFIG.items():
+
+            async def _s3(key=key, bucket=cfg.bucket_name):
+                # signed request - denied credentials or missing bucket fail the probe. Thread is not
+                # cancelled by wait_for, client timeouts and single attempt bound it instead
+                await asyncio.to_thread(s3_client(key, timeout=self.timeout).head_bucket, Bucket=bucket)
+
+            probes.append(_Probe(name=f"s3:{key}", check=_s3, critical=False))
+
+        return probes
+
+    async def _run_probe(self, probe: _Probe) -> ProbeResult:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe.check(), timeout=self.timeout)
+            error = None
+        except TimeoutError:
+            error = "timeout"
+        except Exception as e:
+            error = f"{e.__class__.__name__}: {e}"
+        latency_ms = (time.perf_counter() - start) * 1000
+        return ProbeResult(
+            name=probe.name, ok=error is None, critical=probe.critical, latency_ms=round(latency_ms, 2), error=error
+        )
+
+    async def _run_all(self) -> list[ProbeResult]:
+        return await asyncio.gather(*[self._run_probe(p) for p in self._probes])
+
+    # refresh
+    def _worker(self):
+        self._loop = asyncio.new_event_loop()
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                results = self._loop.run_until_complete(self._run_all())
+            except Exception as e:
+                logger.exception(f"Health probes refresh failed: {e}")
+                continue
+            self._snapshot = tuple(results)
+            self._refreshed_at = time.monotonic()
+            for result in results:
+                if not result.ok:
+                    logger.warning(f"Health probe {result.name} failed: {result.error}")
+
+    def start(self):
+        """Starts background refresh, called at worker boot so readiness is known before first probe"""
+        if self._thread is None:
+            with self._thread_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._worker, name="health-probes", daemon=True)
+                    self._thread.start()
+        self._wakeup.set()
+
+    def snapshot(self) -> tuple[tuple[ProbeResult, ...], float]:
+        """Returns last probe results and their age in seconds, wakes up refresh if stale"""
+        age = time.monotonic() - self._refreshed_at
+        if age >= self.ttl and not self._wakeup.is_set():
+            self.start()
+        return self._snapshot, age
+
+
+_monitor: HealthMonitor | None = None
+
+
+def health_monitor() -> HealthMonitor:
+    global _monitor
+    # engines, pools and event loop are not fork safe - each worker owns its monitor
+    if _monitor is None or _monitor._pid != os.getpid():
+        _monitor = HealthMonitor(ttl=settings.LAMB_HEALTH_CACHE_TTL, timeout=settings.LAMB_HEALTH_PROBE_TIMEOUT)
+    return _monitor
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import weakref
+
+__all__ = ["AsyncQueueHandler", "BatchQueueListener", "async_log_stats", "wrap_handlers_async"]
+
+logger = logging.getLogger(__name__)
+
+# handlers alive in process, used to restart listeners after fork and collect stats
+_handlers: weakref.WeakSet[AsyncQueueHandler] = weakref.WeakSet()
+
+
+class BatchQueueListener(logging.handlers.QueueListener):
+    """Queue listener that drains records in batches and writes each batch to stream handlers at once"""
+
+    batch_size: int = 256
+    source: AsyncQueueHandler | None = None
+    _reported_dropped: int = 0
+
+    def _monitor(self):
+        q = self.queue
+        has_task_done = hasattr(q, "task_done")
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = self._sentinel in batch
+            records = [self.prepare(r) for r in batch if r is not self._sentinel]
+            if (source := self.source) is not None and source.dropped != self._reported_dropped:
+                lost, self._reported_dropped = source.dropped - self._reported_dropped, source.dropped
+                records.append(
+                    logging.makeLogRecord(
+                        {
+                            "name": __name__,
+                            "levelno": logging.WARNING,
+                            "levelname": "WARNING",
+                            "msg": f"Async log queue overflow: {lost} records dropped",
+                        }
+                    )
+                )
+            if records:
+                self.handle_batch(records)
+            if has_task_done:
+                for _ in batch:
+                    q.task_done()
+            if stop:
+                break
+
+    def handle_batch(self, records: list[logging.LogRecord]):
+        for handler in self.handlers:
+            if self.respect_handler_level:
+                accepted = [r for r in records if r.levelno >= handler.level and handler.filter(r)]
+            else:
+                accepted = [r for r in records if handler.filter(r)]
+            if not accepted:
+                continue
+
+            if not isinstance(handler, logging.StreamHandler) or isinstance(handler, logging.FileHandler):
+                for record in accepted:
+                    handler.handle(record)
+                continue
+
+            chunks = []
+            for record in accepted:
+                try:
+                    chunks.append(handler.format(record) + handler.terminator)
+                except Exception:
+                    handler.handleError(record)
+            with handler.lock:
+                try:
+                    handler.stream.write("".join(chunks))
+                    handler.flush()
+                except Exception:
+                    handler.handleError(accepted[-1])
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """Non-blocking handler: puts records into bounded queue served by listener thread
+
+    Records that do not fit into queue are dropped and counted. DEBUG records could be sampled per logger
+    name prefix with ``sampling`` map ``{"api": 0.1}`` - keeps roughly 10% of api.* debug lines.
+    Should be configured with ``listener`` of BatchQueueListener and ``handlers`` of real output handlers.
+    """
+
+    def __init__(self, queue, sampling: dict[str, float] | None = None, batch_size: int | None = None):
+        super().__init__(queue)
+        self.sampling = sampling or {}
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.sampled = 0
+        self._rates: dict[str, float] = {}
+        self._start_lock = threading.Lock()
+        self._started = False
+        # atexit handlers are inherited by forked children, registered once per handler
+        self._stop_registered = False
+        _handlers.add(self)
+
+    # sampling
+    def _rate(self, name: str) -> float:
+        try:
+            return self._rates[name]
+        except KeyError:
+            prefix = max((p for p in self.sampling if name == p or name.startswith(p + ".")), key=len, default=None)
+            rate = self.sampling[prefix] if prefix is not None else 1.0
+            self._rates[name] = rate
+            return rate
+
+    # queue
+    def _start(self):
+        with self._start_lock:
+            if self._started:
+                return
+            if isinstance(self.listener, BatchQueueListener):
+                self.listener.source = self
+                if self.batch_size is not None:
+                    self.listener.batch_size = self.batch_size
+            self.listener.start()
+            self._started = True
+            if not self._stop_registered:
+                atexit.register(self.stop)
+                self._stop_registered = True
+
+    def _after_fork(self):
+        # queue locks and listener thread do not survive fork, records of parent are discarded
+        self.queue = queue.Queue(maxsize=getattr(self.queue, "maxsize", 0))
+        self.listener.queue = self.queue
+        self.listener._thread = None
+        self._start_lock = threading.Lock()
+        self._started = False
+
+    def stop(self):
+        if self._started:
+            self._started = False
+            self.listener.stop()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # merge args in caller thread, formatting itself done by listener
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record: logging.LogRecord):
+        if record.levelno <= logging.DEBUG and self.sampling:
+            rate = self._rate(record.name)
+            if rate < 1.0 and random.random() >= rate:
+                self.sampled += 1
+                return
+        if not self._started and self.listener is not None:
+            self._start()
+        super().emit(record)
+
+
+def async_log_stats() -> dict[str, int]:
+    result = {"queued": 0, "dropped": 0, "sampled": 0}
+    for handler in list(_handlers):
+        result["queued"] += handler.queue.qsize()
+        result["dropped"] += handler.dropped
+        result["sampled"] += handler.sampled
+    return result
+
+
+def wrap_handlers_async(
+    target: logging.Logger,
+    maxsize: int = 10000,
+    batch_size: int | None = None,
+    sampling: dict[str, float] | None = None,
+):
+    """Replaces handlers of logger with single AsyncQueueHandler delegating to them"""
+    handlers = [h for h in target.handlers if not isinstance(h, AsyncQueueHandler)]
+    if not handlers:
+        return
+    for h in handlers:
+        target.removeHandler(h)
+
+    q = queue.Queue(maxsize=maxsize)
+    handler = AsyncQueueHandler(q, sampling=sampling, batch_size=batch_size)
+    handler.listener = BatchQueueListener(q, *handlers, respect_handler_level=True)
+    target.addHandler(handler)
+
+
+def _after_fork_in_child():
+    for handler in list(_handlers):
+        handler._after_fork()
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
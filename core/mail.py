@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import contextlib
+import dataclasses
+import json
+import logging
+import os
+import smtplib
+import ssl
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+
+from core.utils import redis_client
+
+__all__ = [
+    "MailMessage",
+    "MailTransientError",
+    "MailConnectionError",
+    "Mailer",
+    "mailer",
+    "mail_queue_push",
+    "mail_queue_claim",
+    "mail_queue_ack",
+    "mail_queue_release",
+    "mail_queue_recover",
+]
+
+logger = logging.getLogger(__name__)
+
+_QUEUE_KEY = "mail:queue"
+_PROCESSING_KEY = "mail:processing:{owner}"
+_LEASES_KEY = "mail:leases"
+
+
+class MailTransientError(Exception):
+    """Delivery failed for reason that could pass on retry (connection lost, 4xx response)"""
+
+
+class MailConnectionError(MailTransientError):
+    """Connection or login to SMTP server failed - message itself was not tried"""
+
+
+@dataclasses.dataclass(slots=True)
+class MailMessage:
+    to: list[str]
+    subject: str
+    body: str
+    html: str | None = None
+    from_email: str | None = None
+    attempt: int = 0
+
+    def dumps(self) -> str:
+        return json.dumps(dataclasses.asdict(self), ensure_ascii=False)
+
+    @classmethod
+    def loads(cls, value: str) -> MailMessage:
+        return cls(**json.loads(value))
+
+    def as_email(self) -> EmailMultiAlternatives:
+        result = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=self.to,
+        )
+        if self.html is not None:
+            result.attach_alternative(self.html, "text/html")
+        return result
+
+
+# queue
+def mail_queue_push(*messages: MailMessage):
+    if messages:
+        redis_client().rpush(_QUEUE_KEY, *[m.dumps() for m in messages])
+
+
+def mail_queue_claim(owner: str, count: int) -> list[MailMessage]:
+    """Moves up to count messages from queue head into processing list of owner
+
+    Claimed messages stay in redis until acked or released, processing list of crashed owner returns to
+    queue by mail_queue_recover once its lease of LAMB_SMTP_CLAIM_LEASE seconds is over.
+    """
+    key = _PROCESSING_KEY.format(owner=owner)
+    pipeline = redis_client().pipeline(transaction=False)
+    pipeline.zadd(_LEASES_KEY, {owner: time.time() + settings.LAMB_SMTP_CLAIM_LEASE})
+    for _ in range(count):
+        pipeline.lmove(_QUEUE_KEY, key, "LEFT", "RIGHT")
+    values = pipeline.execute()[1:]
+    return [MailMessage.loads(v) for v in values if v is not None]
+
+
+def mail_queue_ack(owner: str):
+    """Removes first claimed message of owner (messages are handled in claim order) and extends lease"""
+    pipeline = redis_client().pipeline(transaction=False)
+    pipeline.lpop(_PROCESSING_KEY.format(owner=owner))
+    pipeline.zadd(_LEASES_KEY, {owner: time.time() + settings.LAMB_SMTP_CLAIM_LEASE}, xx=True)
+    pipeline.execute()
+
+
+def mail_queue_release(owner: str, *messages: MailMessage):
+    """Atomically puts messages back to queue tail and drops rest of owner processing list"""
+    pipeline = redis_client().pipeline(transaction=True)
+    if messages:
+        pipeline.rpush(_QUEUE_KEY, *[m.dumps() for m in messages])
+    pipeline.delete(_PROCESSING_KEY.format(owner=owner))
+    pipeline.zrem(_LEASES_KEY, owner)
+    pipeline.execute()
+
+
+def mail_queue_recover() -> int:
+    """Returns messages claimed by owners with expired lease to queue, returns number of messages"""
+    client = redis_client()
+    result = 0
+    for owner in client.zrangebyscore(_LEASES_KEY, "-inf", time.time()):
+        key = _PROCESSING_KEY.format(owner=owner.decode() if isinstance(owner, bytes) else owner)
+        # each move is atomic - message is either in processing list or in queue
+        while client.lmove(key, _QUEUE_KEY, "LEFT", "RIGHT") is not None:
+            result += 1
+        client.zrem(_LEASES_KEY, owner)
+    return result
+
+
+# delivery
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) / self.rate)
+
+
+class Mailer:
+    """Persistent SMTP connection of worker process with provider rate limit
+
+    Connection opened on first message and reused while alive; after idle period it is checked with NOOP
+    before use. Worker processes never share connection - instance is re-created after fork.
+    """
+
+    def __init__(self, rate_limit: float, burst: int = 1, idle_check: float = 30.0):
+        self._pid = os.getpid()
+        self._connection: smtplib.SMTP | None = None
+        self._used_at = 0.0
+        self._idle_check = idle_check
+        self._bucket = _TokenBucket(rate=rate_limit, burst=burst)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        if settings.EMAIL_USE_SSL:
+            connection = smtplib.SMTP_SSL(
+                settings.EMAIL_HOST,
+                settings.EMAIL_PORT,
+                timeout=settings.EMAIL_TIMEOUT,
+                context=ssl.create_default_context(),
+            )
+        else:
+            connection = smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=settings.EMAIL_TIMEOUT)
+        try:
+            if settings.EMAIL_USE_TLS and not settings.EMAIL_USE_SSL:
+                connection.starttls(context=ssl.create_default_context())
+            if settings.EMAIL_HOST_USER:
+                connection.login(settings.EMAIL_HOST_USER, settings.EMAIL_HOST_PASSWORD)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+    def _connection_alive(self) -> smtplib.SMTP:
+        if self._connection is not None and time.monotonic() - self._used_at > self._idle_check:
+            try:
+                if self._connection.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected
+            except (smtplib.SMTPException, OSError):
+                self.close()
+        if self._connection is None:
+            self._connection = self._connect()
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            with contextlib.suppress(smtplib.SMTPException, OSError):
+                self._connection.quit()
+            self._connection = None
+
+    def send(self, message: MailMessage):
+        """Sends message, raises MailTransientError for retryable failures and SMTPException for permanent
+
+        Any failure to connect or login (including rejected credentials) is MailConnectionError - it says
+        nothing about message, so caller should keep it queued.
+        """
+        email = message.as_email()
+        # send_message flattens with CRLF line ends whatever message class of Django version is
+        payload = email.message()
+        recipients = email.recipients()
+
+        self._bucket.acquire()
+        with self._lock:
+            # one reconnect for connection dropped by server between messages
+            for attempt in range(2):
+                try:
+                    connection = self._connection_alive()
+                except (smtplib.SMTPException, OSError) as e:
+                    self.close()
+                    raise MailConnectionError(str(e)) from e
+                try:
+                    connection.send_message(payload, email.from_email, recipients)
+                    self._used_at = time.monotonic()
+                    return
+                # smtp errors are OSError subclasses - responses of server are handled before connection errors
+                except smtplib.SMTPRecipientsRefused as e:
+                    if all(400 <= code < 500 for code, _ in e.recipients.values()):
+                        raise MailTransientError(str(e)) from e
+                    raise
+                except smtplib.SMTPResponseException as e:
+                    if 400 <= e.smtp_code < 500:
+                        raise MailTransientError(str(e)) from e
+                    raise
+                except smtplib.SMTPNotSupportedError:
+                    raise
+                except OSError as e:
+                    self.close()
+                    if attempt:
+                        raise MailTransientError(str(e)) from e
+
+
+_mailer: Mailer | None = None
+
+
+def mailer() -> Mailer:
+    global _mailer
+    if _mailer is None or _mailer._pid != os.getpid():
+        _mailer = Mailer(rate_limit=settings.LAMB_SMTP_RATE_LIMIT, burst=settings.LAMB_SMTP_RATE_BURST)
+    return _mailer
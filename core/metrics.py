@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import contextvars
+import dataclasses
+import logging
+import os
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess, start_http_server
+from prometheus_client.registry import REGISTRY
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+__all__ = [
+    "RequestTimings",
+    "collect_metrics",
+    "start_metrics_exporter",
+    "current_timings",
+    "observe_redis_time",
+    "request_timings",
+    "reset_timings",
+    "VIEW_LATENCY",
+    "MIDDLEWARE_LATENCY",
+    "DB_TIME",
+    "REDIS_TIME",
+    "RESPONSE_SIZE",
+    "BEAT_DISPATCH_DELAY",
+    "BEAT_LATE_RUNS",
+    "BEAT_SKIPPED_RUNS",
+    "COALESCED_REQUESTS",
+    "AUTH_SHORT_CIRCUITED",
+]
+
+logger = logging.getLogger(__name__)
+
+# with PROMETHEUS_MULTIPROC_DIR set values are stored in mmap files shared by all gunicorn workers
+_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+VIEW_LATENCY = Histogram(
+    "app_view_latency_seconds", "Request latency per view", ["view", "method", "status"], buckets=_LATENCY_BUCKETS
+)
+MIDDLEWARE_LATENCY = Histogram(
+    "app_middleware_latency_seconds", "Exclusive time spent inside middleware", ["middleware"], buckets=_LATENCY_BUCKETS
+)
+DB_TIME = Histogram("app_db_time_seconds", "Database time per request", ["view"], buckets=_LATENCY_BUCKETS)
+REDIS_TIME = Histogram("app_redis_time_seconds", "Redis time per request", ["view"], buckets=_LATENCY_BUCKETS)
+RESPONSE_SIZE = Histogram("app_response_size_bytes", "Response body size", ["view"], buckets=_SIZE_BUCKETS)
+
+# periodic tasks
+BEAT_DISPATCH_DELAY = Histogram(
+    "app_beat_dispatch_delay_seconds",
+    "Delay between scheduled and actual dispatch of periodic task",
+    ["task"],
+    buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+)
+BEAT_LATE_RUNS = Counter("app_beat_late_runs", "Periodic runs dispatched later than allowed threshold", ["task"])
+BEAT_SKIPPED_RUNS = Counter("app_beat_skipped_runs", "Periodic runs skipped while previous run still active", ["task"])
+
+# request coalescing
+COALESCED_REQUESTS = Counter(
+    "app_coalesced_requests", "Requests by role in single flight: leader, follower, shared, overflow", ["view", "role"]
+)
+
+# auth
+AUTH_SHORT_CIRCUITED = Counter(
+    "app_auth_short_circuited", "Requests with bad access token rejected before database access", ["reason"]
+)
+
+
+@dataclasses.dataclass(slots=True)
+class RequestTimings:
+    db: float = 0.0
+    redis: float = 0.0
+
+
+_request_timings: contextvars.ContextVar[RequestTimings | None] = contextvars.ContextVar(
+    "app_request_timings", default=None
+)
+
+
+def request_timings() -> contextvars.Token:
+    """Starts accumulation of db/redis time for current context, returns token for reset"""
+    return _request_timings.set(RequestTimings())
+
+
+def current_timings() -> RequestTimings | None:
+    return _request_timings.get()
+
+
+def reset_timings(token: contextvars.Token):
+    _request_timings.reset(token)
+
+
+def observe_redis_time(elapsed: float):
+    if (timings := _request_timings.get()) is not None:
+        timings.redis += elapsed
+
+
+# database time
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_timings.get() is not None:
+        conn.info.setdefault("app_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if (timings := _request_timings.get()) is not None and (starts := conn.info.get("app_query_start")):
+        timings.db += time.perf_counter() - starts.pop()
+
+
+# exposition
+def _registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def collect_metrics() -> bytes:
+    return generate_latest(_registry())
+
+
+def start_metrics_exporter(port: int, addr: str = "0.0.0.0"):
+    """Serves metrics on own http port from daemon thread, for processes without web views (celery)"""
+    if not port:
+        return
+    try:
+        start_http_server(port, addr=addr, registry=_registry())
+    except OSError as e:
+        logger.warning(f"Metrics exporter could not listen on {addr}:{port}: {e}")
+        return
+    logger.info(f"Metrics exporter listens on {addr}:{port}")
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from types import CodeType, FrameType
+
+import redis
+from django.conf import settings
+
+from core.utils import redis_client
+
+__all__ = [
+    "StackSampler",
+    "sample_process",
+    "profile_listener_start",
+    "profile_broadcast",
+    "profile_results",
+    "store_request_profile",
+    "load_request_profile",
+]
+
+logger = logging.getLogger(__name__)
+
+_CHANNEL = "profile:requests"
+_RESULT_KEY = "profile:result:{request_id}"
+_REQUEST_KEY = "profile:xray:{xray}"
+_RESULT_TTL = 3600
+
+
+class StackSampler:
+    """Statistical wall-clock profiler sampling python stacks from background thread
+
+    Each sample is one sys._current_frames() call plus frame walk, at 5ms interval CPU bound code slows
+    down by a few percent (mostly GIL hand-off to sampler thread). Time spent in C code is attributed to
+    calling python frame. Result is counter of collapsed stacks (root first, frames separated with ";") as
+    consumed by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = 0.005, thread_ids: set[int] | None = None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.samples: collections.Counter[str] = collections.Counter()
+        self._labels: dict[CodeType, str] = {}
+        self._thread_names: dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _label(self, code: CodeType) -> str:
+        if (label := self._labels.get(code)) is None:
+            label = self._labels[code] = (
+                f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+        return label
+
+    def _thread_name(self, ident: int) -> str:
+        if (name := self._thread_names.get(ident)) is None:
+            self._thread_names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._thread_names.setdefault(ident, str(ident))
+        return name
+
+    def _collapse(self, ident: int, frame: FrameType | None) -> str:
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.append(self._thread_name(ident))
+        return ";".join(reversed(stack))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                self.samples[self._collapse(ident, frame)] += 1
+
+    def start(self) -> StackSampler:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> collections.Counter[str]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def sample_process(seconds: float, interval: float | None = None) -> str:
+    """Samples all threads of current process for given time, returns collapsed stacks"""
+    sampler = StackSampler(interval=interval or settings.LAMB_PROFILING_INTERVAL).start()
+    time.sleep(seconds)
+    sampler.stop()
+    return sampler.collapsed()
+
+
+# cross-process sampling
+def _listen(role: str):
+    while True:
+        pubsub = None
+        try:
+            pubsub = redis_client().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(_CHANNEL)
+            for message in pubsub.listen():
+                request = json.loads(message["data"])
+                if request["role"] not in (role, "all"):
+                    continue
+                collapsed = sample_process(request["seconds"], request["interval"])
+                key = _RESULT_KEY.format(request_id=request["id"])
+                pipeline = redis_client().pipeline()
+                pipeline.hset(key, f"{role}-{os.getpid()}", collapsed)
+                pipeline.expire(key, _RESULT_TTL)
+                pipeline.execute()
+        except (redis.RedisError, OSError, ValueError, KeyError) as e:
+            logger.warning(f"Profile listener failed: {e}")
+            time.sleep(5)
+        finally:
+            if pubsub is not None:
+                pubsub.close()
+
+
+def profile_listener_start(role: str):
+    """Makes current process (gunicorn worker, celery pool process) answer profile broadcasts of role"""
+    if not settings.LAMB_PROFILING_ENABLED:
+        return
+    threading.Thread(target=_listen, args=(role,), name="profile-listener", daemon=True).start()
+
+
+def profile_broadcast(role: str, seconds: float, interval: float | None = None) -> tuple[str, int]:
+    """Asks every listening process of role to sample itself, returns request id and number of receivers"""
+    request_id = uuid.uuid4().hex
+    message = {
+        "id": request_id,
+        "role": role,
+        "seconds": seconds,
+        "interval": interval or settings.LAMB_PROFILING_INTERVAL,
+    }
+    receivers = redis_client().publish(_CHANNEL, json.dumps(message))
+    return request_id, receivers
+
+
+def profile_results(request_id: str) -> str:
+    """Merged collapsed stacks of broadcast, each process becomes root frame"""
+    results = redis_client().hgetall(_RESULT_KEY.format(request_id=request_id))
+    return "\n".join(
+        f"{process};{line}" for process, collapsed in sorted(results.items()) for line in collapsed.splitlines()
+    )
+
+
+# per request profiles
+def store_request_profile(xray: str, collapsed: str):
+    redis_client().set(_REQUEST_KEY.format(xray=xray), collapsed, ex=_RESULT_TTL)
+
+
+def load_request_profile(xray: str) -> str | None:
+    return redis_client().get(_REQUEST_KEY.format(xray=xray))
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+__all__ = ["cpu_limit", "memory_limit", "process_pss", "worker_count", "start_memory_watchdog"]
+
+logger = logging.getLogger(__name__)
+
+_CGROUP_ROOT = Path("/sys/fs/cgroup")
+# cgroup v1 reports "unlimited" as huge page-aligned number
+_CGROUP_V1_UNLIMITED = 1 << 60
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit() -> float:
+    """CPUs available to process: cgroup quota (v2 or v1) bounded by scheduler affinity"""
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+    quota = None
+    if (value := _read(_CGROUP_ROOT / "cpu.max")) is not None:
+        limit, _, period = value.partition(" ")
+        if limit != "max":
+            quota = int(limit) / int(period or 100000)
+    elif (value := _read(_CGROUP_ROOT / "cpu" / "cpu.cfs_quota_us")) is not None and int(value) > 0:
+        period = _read(_CGROUP_ROOT / "cpu" / "cpu.cfs_period_us") or "100000"
+        quota = int(value) / int(period)
+
+    return min(available, quota) if quota else float(available)
+
+
+def memory_limit() -> int | None:
+    """Memory limit of cgroup in bytes, None if not limited"""
+    if (value := _read(_CGROUP_ROOT / "memory.max")) is not None:
+        return None if value == "max" else int(value)
+    if (value := _read(_CGROUP_ROOT / "memory" / "memory.limit_in_bytes")) is not None:
+        return None if int(value) >= _CGROUP_V1_UNLIMITED else int(value)
+    return None
+
+
+def process_pss() -> int:
+    """Proportional set size of current process in bytes
+
+    Shared pages - copy-on-write memory inherited from master, mmaped GeoIP databases - are split between
+    processes mapping them, so value grows with own memory of worker only and sums to total over workers.
+    Falls back to RSS where smaps_rollup is not available (linux < 4.14).
+    """
+    if (value := _read(Path("/proc/self/smaps_rollup"))) is not None:
+        for line in value.splitlines():
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) * 1024
+    if (value := _read(Path("/proc/self/statm"))) is not None:
+        return int(value.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    import resource
+
+    # linux-less fallback reports peak, on macOS in bytes
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def worker_count(cpus: float, per_cpu: float, worker_memory: int, memory: int | None) -> int:
+    """Workers for given CPU share, capped by how many expected worker PSS fit into 90% of memory limit"""
+    count = max(1, math.ceil(cpus * per_cpu))
+    if memory is not None and worker_memory > 0:
+        count = min(count, max(1, int(memory * 0.9 // worker_memory)))
+    return count
+
+
+def start_memory_watchdog(max_pss: int, interval: float = 10.0) -> threading.Thread:
+    """Sends SIGTERM to own process once PSS exceeds max_pss
+
+    Gunicorn (and uvicorn) workers treat SIGTERM as graceful shutdown: in-flight requests complete and
+    master spawns replacement, so worker is recycled by memory growth instead of fixed request count.
+    """
+
+    def _watch():
+        while True:
+            time.sleep(interval)
+            if (pss := process_pss()) > max_pss:
+                logger.warning(f"Worker {os.getpid()} PSS {pss >> 20}MB exceeds {max_pss >> 20}MB, recycling")
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+    thread = threading.Thread(target=_watch, name="memory-watchdog", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import concurrent.futures
+import dataclasses
+import functools
+import logging
+import threading
+from collections.abc import Iterator
+from typing import BinaryIO
+
+import boto3
+from botocore.client import BaseClient
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+
+import lamb.exc as exc
+
+__all__ = [
+    "S3Object",
+    "s3_client",
+    "s3_stream_upload",
+    "s3_stream_download",
+    "s3_presigned_url",
+]
+
+logger = logging.getLogger(__name__)
+
+_MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class S3Object:
+    key: str
+    size: int
+    etag: str | None = None
+    content_type: str | None = None
+    content_range: str | None = None
+
+
+@functools.cache
+def s3_client(config_name: str = "default", timeout: float | None = None) -> BaseClient:
+    """Shared client of S3 config, timeout gives separate client failing fast - single attempt bounded by it"""
+    cfg = settings.LAMB_S3_CONFIG[config_name]
+    config = Config(
+        signature_version="s3v4",
+        s3={"addressing_style": "path"},
+        max_pool_connections=max(settings.LAMB_S3_UPLOAD_CONCURRENCY * 4, 10),
+    )
+    if timeout is not None:
+        config = config.merge(Config(connect_timeout=timeout, read_timeout=timeout, retries={"max_attempts": 1}))
+    return boto3.client(
+        "s3",
+        endpoint_url=cfg.endpoint_url,
+        aws_access_key_id=cfg.access_key,
+        aws_secret_access_key=cfg.secret_key,
+        config=config,
+    )
+
+
+def _read_part(stream: BinaryIO, size: int) -> bytes:
+    # request streams could return less than asked, collect full part
+    chunks, left = [], size
+    while left > 0:
+        chunk = stream.read(left)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        left -= len(chunk)
+    return b"".join(chunks)
+
+
+def s3_stream_upload(
+    stream: BinaryIO,
+    key: str,
+    content_type: str | None = None,
+    config_name: str = "default",
+    part_size: int | None = None,
+    concurrency: int | None = None,
+) -> S3Object:
+    """Streams file-like object to S3 without buffering it whole
+
+    Body read by parts of part_size and uploaded as multipart upload with up to concurrency parts in flight,
+    so memory usage bounded by part_size * (concurrency + 1). Small bodies stored with single PUT.
+    """
+    client = s3_client(config_name)
+    bucket = settings.LAMB_S3_CONFIG[config_name].bucket_name
+    part_size = max(part_size or settings.LAMB_S3_UPLOAD_PART_SIZE, _MIN_PART_SIZE)
+    concurrency = concurrency or settings.LAMB_S3_UPLOAD_CONCURRENCY
+    extra = {"ContentType": content_type} if content_type else {}
+
+    first = _read_part(stream, part_size)
+    try:
+        if len(first) < part_size:
+            response = client.put_object(Bucket=bucket, Key=key, Body=first, **extra)
+            return S3Object(key=key, size=len(first), etag=response.get("ETag"), content_type=content_type)
+
+        upload_id = client.create_multipart_upload(Bucket=bucket, Key=key, **extra)["UploadId"]
+    except (BotoCoreError, ClientError) as e:
+        raise exc.ExternalServiceError("Could not store object") from e
+
+    slots = threading.BoundedSemaphore(concurrency)
+    failed = threading.Event()
+    size = 0
+
+    def _upload(number: int, body: bytes) -> dict:
+        try:
+            response = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body)
+            return {"PartNumber": number, "ETag": response["ETag"]}
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            slots.release()
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = []
+            number, body = 1, first
+            while body and not failed.is_set():
+                slots.acquire()
+                futures.append(executor.submit(_upload, number, body))
+                size += len(body)
+                number += 1
+                body = _read_part(stream, part_size)
+            parts = [f.result() for f in futures]
+
+        response = client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id, MultipartUpload={"Parts": parts}
+        )
+    except Exception as e:
+        logger.warning(f"Multipart upload of {key} failed, aborting: {e}")
+        try:
+            client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        except (BotoCoreError, ClientError):
+            logger.exception(f"Could not abort multipart upload {upload_id}")
+        if isinstance(e, BotoCoreError | ClientError):
+            raise exc.ExternalServiceError("Could not store object") from e
+        raise
+
+    return S3Object(key=key, size=size, etag=response.get("ETag"), content_type=content_type)
+
+
+def s3_stream_download(
+    key: str,
+    byte_range: str | None = None,
+    config_name: str = "default",
+    chunk_size: int = 64 * 1024,
+) -> tuple[S3Object, Iterator[bytes]]:
+    """Opens object (or its range in HTTP Range header format) for chunked reading"""
+    client = s3_client(config_name)
+    bucket = settings.LAMB_S3_CONFIG[config_name].bucket_name
+    params = {"Range": byte_range} if byte_range else {}
+    try:
+        response = client.get_object(Bucket=bucket, Key=key, **params)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code in ("NoSuchKey", "404"):
+            raise exc.NotExistError(f"Object {key} not found") from e
+        if code == "InvalidRange":
+            raise exc.InvalidParamValueError("Invalid range", error_details={"key_path": "Range"}) from e
+        raise exc.ExternalServiceError("Could not read object") from e
+    except BotoCoreError as e:
+        raise exc.ExternalServiceError("Could not read object") from e
+
+    info = S3Object(
+        key=key,
+        size=response["ContentLength"],
+        etag=response.get("ETag"),
+        content_type=response.get("ContentType"),
+        content_range=response.get("ContentRange"),
+    )
+    return info, response["Body"].iter_chunks(chunk_size)
+
+
+def s3_presigned_url(
+    key: str,
+    method: str = "GET",
+    expires: int | None = None,
+    content_type: str | None = None,
+    config_name: str = "default",
+) -> str:
+    """Issues presigned URL for direct client upload (PUT) or download (GET) bypassing workers"""
+    client = s3_client(config_name)
+    params = {"Bucket": settings.LAMB_S3_CONFIG[config_name].bucket_name, "Key": key}
+    if method == "PUT" and content_type:
+        params["ContentType"] = content_type
+    operation = {"GET": "get_object", "PUT": "put_object"}[method]
+    return client.generate_presigned_url(
+        operation, Params=params, ExpiresIn=expires or settings.LAMB_S3_PRESIGN_EXPIRES, HttpMethod=method
+    )
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import dataclasses
+import functools
+import logging
+import secrets
+import threading
+import uuid
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+import jwt
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+from django.conf import settings
+
+import lamb.exc as exc
+from lamb.utils import tz_now
+
+from core.constants import AccessTokenMode, UserRole
+from core.utils import TTLCache, redis_client
+
+__all__ = [
+    "AccessClaims",
+    "access_token_mode",
+    "jwt_encode_access_token",
+    "jwt_decode_access_token",
+    "jwt_revoked_before",
+    "jwt_revoke_user_tokens",
+]
+
+logger = logging.getLogger(__name__)
+
+_REVOKED_KEY = "auth:jwt:revoked:{user_id}"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class AccessClaims:
+    user_id: uuid.UUID
+    role: UserRole
+    time_expire: datetime
+    jti: str
+    time_issued: datetime
+
+
+def access_token_mode() -> AccessTokenMode:
+    return AccessTokenMode(settings.LAMB_AUTH_TOKEN_MODE)
+
+
+# keys
+@dataclasses.dataclass(frozen=True, slots=True)
+class _KeySet:
+    kid: str
+    signing_key: Any
+    verify_keys: dict[str, Any]
+
+
+@functools.cache
+def _key_set() -> _KeySet:
+    """Loads signing key and verification keys once per process"""
+    try:
+        signing_key = load_pem_private_key(Path(settings.LAMB_AUTH_JWT_PRIVATE_KEY).read_bytes(), password=None)
+        verify_keys = {settings.LAMB_AUTH_JWT_KEY_ID: signing_key.public_key()}
+        for path in settings.LAMB_AUTH_JWT_PUBLIC_KEYS_EXTRA:
+            path = Path(path)
+            verify_keys[path.stem] = load_pem_public_key(path.read_bytes())
+    except (OSError, ValueError) as e:
+        raise exc.ImproperlyConfiguredError("Could not load JWT keys") from e
+
+    return _KeySet(kid=settings.LAMB_AUTH_JWT_KEY_ID, signing_key=signing_key, verify_keys=verify_keys)
+
+
+# revocation
+_revoked: TTLCache | None = None
+_revoked_lock = threading.Lock()
+
+
+def _revoked_cache() -> TTLCache:
+    global _revoked
+    if _revoked is None:
+        with _revoked_lock:
+            if _revoked is None:
+                _revoked = TTLCache(
+                    settings.LAMB_AUTH_JWT_REVOCATION_CACHE_SIZE, settings.LAMB_AUTH_JWT_REVOCATION_CACHE_TTL
+                )
+    return _revoked
+
+
+def jwt_revoked_before(user_id: uuid.UUID) -> float:
+    """Timestamp before which access tokens of user are revoked, 0 if none
+
+    Cached per worker for LAMB_AUTH_JWT_REVOCATION_CACHE_TTL, so revocation applies with that delay.
+    """
+    cache = _revoked_cache()
+    if (value := cache.get(user_id)) is None:
+        value = float(redis_client().get(_REVOKED_KEY.format(user_id=user_id)) or 0)
+        cache.set(user_id, value)
+    return value
+
+
+def jwt_revoke_user_tokens(user_id: uuid.UUID):
+    """Invalidates all access tokens of user issued until now
+
+    Marker lives as long as access tokens do - older tokens are expired anyway once it is gone.
+    """
+    redis_client().set(
+        _REVOKED_KEY.format(user_id=user_id), tz_now().timestamp(), ex=settings.LAMB_AUTH_JWT_ACCESS_TOKEN_TTL
+    )
+
+
+# encode/decode
+def jwt_encode_access_token(user_id: uuid.UUID, role: UserRole, ttl: int) -> tuple[str, datetime]:
+    key_set = _key_set()
+    time_issued = tz_now()
+    time_expire = time_issued + timedelta(seconds=ttl)
+    payload = {
+        "sub": str(user_id),
+        "role": role.value,
+        # fractional seconds - token issued right after revocation should stay valid
+        "iat": time_issued.timestamp(),
+        "exp": time_expire,
+        "jti": secrets.token_urlsafe(16),
+    }
+    token = jwt.encode(
+        payload,
+        key_set.signing_key,
+        algorithm=settings.LAMB_AUTH_JWT_ALGORITHM,
+        headers={"kid": key_set.kid},
+    )
+    return token, time_expire
+
+
+def jwt_decode_access_token(token: str, check_revocation: bool | None = None) -> AccessClaims:
+    key_set = _key_set()
+    if check_revocation is None:
+        check_revocation = settings.LAMB_AUTH_JWT_REVOCATION_CHECK
+
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        key = key_set.verify_keys[kid]
+        payload = jwt.decode(
+            token,
+            key,
+            algorithms=[settings.LAMB_AUTH_JWT_ALGORITHM],
+            options={"require": ["sub", "role", "iat", "exp", "jti"]},
+        )
+        claims = AccessClaims(
+            user_id=uuid.UUID(payload["sub"]),
+            role=UserRole(payload["role"]),
+            time_expire=datetime.fromtimestamp(payload["exp"], tz=UTC),
+            jti=payload["jti"],
+            time_issued=datetime.fromtimestamp(payload["iat"], tz=UTC),
+        )
+    except jwt.ExpiredSignatureError as e:
+        raise exc.AuthTokenExpiredError from e
+    except (jwt.InvalidTokenError, KeyError, ValueError) as e:
+        raise exc.AuthTokenInvalidError from e
+
+    if check_revocation and claims.time_issued.timestamp() <= jwt_revoked_before(claims.user_id):
+        raise exc.AuthTokenExpiredError
+
+    return claims
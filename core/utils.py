@@ -1,5 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import functools
 import logging
+import threading
+import time
+import weakref
+from collections.abc import Hashable
+from typing import Any
+
+import redis
+import redis.asyncio as aredis
+from django.conf import settings
+
+from core.metrics import observe_redis_time
 
-__all__ = []
+__all__ = ["redis_client", "async_redis_client", "TTLCache"]
 
 logger = logging.getLogger(__name__)
+
+
+class _TimedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            observe_redis_time(time.perf_counter() - start)
+
+
+@functools.cache
+def redis_client(config_name: str = "cache") -> redis.Redis:
+    """Process wide redis client for one of LAMB_REDIS_CONFIG connections
+
+    Connection pool is shared inside process and re-created by redis-py itself after fork
+    """
+    config = settings.LAMB_REDIS_CONFIG[config_name]
+    return _TimedRedis.from_url(config.url, decode_responses=True)
+
+
+class _TimedAsyncRedis(aredis.Redis):
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            observe_redis_time(time.perf_counter() - start)
+
+
+_async_clients: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, aredis.Redis]] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def async_redis_client(config_name: str = "cache") -> aredis.Redis:
+    """Asyncio redis client for one of LAMB_REDIS_CONFIG connections bound to running event loop
+
+    Asyncio connections could not be shared between loops, so every loop gets own client
+    """
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if (client := clients.get(config_name)) is None:
+        config = settings.LAMB_REDIS_CONFIG[config_name]
+        client = clients[config_name] = _TimedAsyncRedis.from_url(config.url, decode_responses=True)
+    return client
+
+
+class TTLCache:
+    """Bounded LRU map with per-entry ttl, least recently read or written entries evicted first
+
+    Every access reorders entries, so reads take lock too.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: collections.OrderedDict[Hashable, tuple[Any, float]] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[1] < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
@@ -1,12 +1,26 @@
 import os
+import shutil
 from datetime import datetime
+from pathlib import Path
 
 from gunicorn.instrument.statsd import Statsd as StatsdLogger
 
 from lamb.utils import dpath_value
 from lamb.utils.transformers import transform_boolean
 
+from core.resources import cpu_limit, memory_limit, start_memory_watchdog, worker_count
+
 LAMB_LOG_JSON_ENABLE = dpath_value(os.environ, "LAMB_LOG_JSON_ENABLE", str, transform=transform_boolean, default=False)
+LAMB_LOG_ASYNC_ENABLE = dpath_value(os.environ, "LAMB_LOG_ASYNC_ENABLE", str, transform=transform_boolean, default=True)
+LAMB_LOG_ASYNC_QUEUE_SIZE = dpath_value(os.environ, "LAMB_LOG_ASYNC_QUEUE_SIZE", int, default=10000)
+LAMB_GUNICORN_PROFILE = dpath_value(os.environ, "LAMB_GUNICORN_PROFILE", str, default="sync")
+LAMB_GUNICORN_WORKERS = dpath_value(os.environ, "LAMB_GUNICORN_WORKERS", int, default=0)
+LAMB_GUNICORN_THREADS = dpath_value(os.environ, "LAMB_GUNICORN_THREADS", int, default=4)
+LAMB_GUNICORN_WORKER_MEMORY = dpath_value(os.environ, "LAMB_GUNICORN_WORKER_MEMORY", int, default=256 << 20)
+LAMB_GUNICORN_WORKER_MAX_PSS = dpath_value(os.environ, "LAMB_GUNICORN_WORKER_MAX_PSS", int, default=0)
+
+# prometheus multiprocess storage shared by workers, should be set before any prometheus_client import
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", str(Path(__file__).resolve().parent.joinpath("tmp", "prometheus")))
 
 
 class CustomLogger(StatsdLogger):
@@ -62,15 +76,82 @@ logconfig_dict = {
     },
 }
 
+# move stream writes of access/error logs out of request path
+if LAMB_LOG_ASYNC_ENABLE:
+    for _name in ["console", "error_console"]:
+        logconfig_dict["handlers"][f"{_name}_async"] = {
+            "class": "core.log.AsyncQueueHandler",
+            "listener": "core.log.BatchQueueListener",
+            "queue": {"()": "queue.Queue", "maxsize": LAMB_LOG_ASYNC_QUEUE_SIZE},
+            "handlers": [_name],
+        }
+    for _logger in logconfig_dict["loggers"].values():
+        _logger["handlers"] = [f"{h}_async" for h in _logger["handlers"]]
+
 # number of requests in queue waiting for workers
 backlog = 2048
 
 # bind
 bind = ["127.0.0.1:8000", "[::1]:8000"]
 
-# max requests until worker rotate
-max_requests = 4096
+# deployment profiles, each owns worker class together with application it serves:
+# - sync: WSGI gthread workers, async views are executed through async_to_sync on worker threads
+# - asgi: uvicorn worker per CPU, async views run natively on event loop
+_profiles = {
+    "sync": ("gthread", "{{project_name}}.wsgi:application", 2),
+    "asgi": ("uvicorn.workers.UvicornWorker", "{{project_name}}.asgi:application", 1),
+}
+if LAMB_GUNICORN_PROFILE not in _profiles:
+    raise ValueError(f"Unknown LAMB_GUNICORN_PROFILE: {LAMB_GUNICORN_PROFILE}, allowed: {list(_profiles)}")
+worker_class, wsgi_app, _workers_per_cpu = _profiles[LAMB_GUNICORN_PROFILE]
+threads = LAMB_GUNICORN_THREADS
+
+# workers sized from cgroup CPU quota and capped by cgroup memory limit
+_cpus, _memory = cpu_limit(), memory_limit()
+workers = LAMB_GUNICORN_WORKERS or worker_count(_cpus, _workers_per_cpu, LAMB_GUNICORN_WORKER_MEMORY, _memory)
+
+# recycle worker by memory growth, fixed request count rotation is kept only when no memory bound known
+_worker_max_pss = LAMB_GUNICORN_WORKER_MAX_PSS or (int(_memory * 0.9 // workers) if _memory else 0)
+max_requests = 0 if _worker_max_pss else 4096
 max_requests_jitter = 128
 
 # processing/harakiri timeout
 timeout = 30
+
+
+# metrics storage lifecycle
+def on_starting(server):
+    # application given in command line replaces wsgi_app, it should be the one profile worker can serve
+    app_uri = getattr(server.app, "app_uri", None) or wsgi_app
+    if app_uri.partition(":")[0] != wsgi_app.partition(":")[0]:
+        raise ValueError(
+            f"Application {app_uri} does not match LAMB_GUNICORN_PROFILE={LAMB_GUNICORN_PROFILE} ({wsgi_app}), "
+            f"drop it from command line or select matching profile"
+        )
+
+    path = Path(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+    server.log.info(
+        f"Profile {LAMB_GUNICORN_PROFILE}: cpus={_cpus:.2f}, memory={_memory}, workers={workers}, "
+        f"threads={threads}, worker_max_pss={_worker_max_pss}"
+    )
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+# runtime configs and health probes are loaded before worker accepts requests
+def post_worker_init(worker):
+    from core.dynamic_config import dynamic_config_preload
+    from core.health import health_monitor
+    from core.profiling import profile_listener_start
+
+    dynamic_config_preload()
+    profile_listener_start("web")
+    health_monitor().start()
+    if _worker_max_pss:
+        start_memory_watchdog(_worker_max_pss)
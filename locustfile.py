@@ -0,0 +1,24 @@
+"""Load profile for comparing gunicorn deployment profiles
+
+Used by `python manage.py bench_server_profiles`, could be run manually against running server:
+
+    locust -f locustfile.py --headless -u 200 -r 50 -t 60s --host http://127.0.0.1:8000
+"""
+
+from locust import FastHttpUser, between, task
+
+
+class ApiUser(FastHttpUser):
+    wait_time = between(0.0, 0.05)
+
+    @task(10)
+    def ping(self):
+        self.client.get("/api/ping")
+
+    @task(5)
+    def configs(self):
+        self.client.get("/api/configs")
+
+    @task(1)
+    def ready(self):
+        self.client.get("/api/ready")
@@ -1 +1,22 @@
+import atexit
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# celery processes (beat, worker and its pool children) share own prometheus multiprocess storage exported by
+# their main process, web workers get storage from gunicorn.conf.py - should be set before prometheus import
+if sys.argv and "celery" in Path(sys.argv[0]).parts[-2:] and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+    _metrics_pid = os.getpid()
+    _metrics_path = Path(__file__).resolve().parent.parent.joinpath("tmp", f"prometheus-celery-{_metrics_pid}")
+    _metrics_path.mkdir(parents=True, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = str(_metrics_path)
+
+    @atexit.register
+    def _metrics_cleanup():
+        # pool children inherit handler, only main process owns storage
+        if os.getpid() == _metrics_pid:
+            shutil.rmtree(_metrics_path, ignore_errors=True)
+
+
 from .celery_config import celery_app  # noqa: F401
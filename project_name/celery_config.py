@@ -1,15 +1,29 @@
 import enum
 import os
+from collections.abc import Callable
+from datetime import timedelta
 
 from celery import Celery
-from celery.signals import after_setup_logger, after_setup_task_logger
+from celery.signals import (
+    after_setup_logger,
+    after_setup_task_logger,
+    beat_init,
+    worker_init,
+    worker_process_init,
+    worker_process_shutdown,
+)
 from django.conf import settings
 from kombu import Exchange, Queue
 
 import lamb.log.constants
 from lamb.log.formatters import CeleryJsonFormatter, CeleryMultilineFormatter
 
-__all__ = ["celery_app", "CeleryQueues"]
+from core.beat import singleton_task
+from core.log import wrap_handlers_async
+from core.metrics import start_metrics_exporter
+from core.profiling import profile_listener_start
+
+__all__ = ["celery_app", "CeleryQueues", "periodic_task"]
 
 
 # Django init
@@ -42,12 +56,50 @@ celery_app = Celery(
     worker_task_log_format=lamb.log.constants.LAMB_LOG_FORMAT_CELERY_TASK_SIMPLE,
     broker_transport_options=settings.LAMB_BROKER_TRANSPORT_OPTIONS,
     result_backend_transport_options=settings.LAMB_BROKER_RESULT_TRANSPORT_OPTIONS,
+    beat_scheduler="core.beat:LeaderScheduler",
 )
 
 
 # Celery Beat tasks
 celery_app.conf.beat_schedule = {}
 
+
+def periodic_task(
+    schedule,
+    queue: CeleryQueues = CeleryQueues.maintenance,
+    args: tuple = (),
+    kwargs: dict | None = None,
+    singleton: bool = True,
+    lock_ttl: float | None = None,
+    expires: float | None = None,
+    **options,
+) -> Callable:
+    """Declares bound celery task and registers it in beat schedule
+
+    Schedule could be number of seconds, timedelta or crontab. Singleton tasks skip run while previous one
+    still holds redis lock (lock_ttl defaults to LAMB_BEAT_LOCK_TTL). Interval tasks by default expire after
+    one interval, so runs queued behind a stuck worker are not executed in burst later.
+    """
+
+    def decorator(func: Callable) -> celery_app.Task:
+        body = singleton_task(func, ttl=lock_ttl) if singleton else func
+        task = celery_app.task(queue=queue, bind=True, ignore_result=True, **options)(body)
+
+        entry_expires = expires
+        if entry_expires is None and isinstance(schedule, int | float | timedelta):
+            entry_expires = schedule.total_seconds() if isinstance(schedule, timedelta) else schedule
+        celery_app.conf.beat_schedule[task.name] = {
+            "task": task.name,
+            "schedule": schedule,
+            "args": args,
+            "kwargs": kwargs or {},
+            "options": {"queue": queue, "expires": entry_expires},
+        }
+        return task
+
+    return decorator
+
+
 celery_formatter_cls = CeleryJsonFormatter if settings.LAMB_LOG_JSON_ENABLE else CeleryMultilineFormatter
 
 
@@ -56,6 +108,13 @@ def setup_task_logger(logger, *args, **kwargs):
     # print(f"setup_task_logger: {logger, args, kwargs}")
     for handler in logger.handlers:
         handler.setFormatter(celery_formatter_cls(lamb.log.constants.LAMB_LOG_FORMAT_CELERY_TASK_SIMPLE))
+    if settings.LAMB_LOG_ASYNC_ENABLE:
+        wrap_handlers_async(
+            logger,
+            maxsize=settings.LAMB_LOG_ASYNC_QUEUE_SIZE,
+            batch_size=settings.LAMB_LOG_ASYNC_BATCH_SIZE,
+            sampling=settings.LAMB_LOG_DEBUG_SAMPLING,
+        )
 
 
 @after_setup_logger.connect
@@ -63,3 +122,35 @@ def setup_logger(logger, *args, **kwargs):
     # print(f"setup_logger: {logger, args, kwargs}")
     for handler in logger.handlers:
         handler.setFormatter(celery_formatter_cls(lamb.log.constants.LAMB_LOG_FORMAT_CELERY_MAIN_SIMPLE))
+    if settings.LAMB_LOG_ASYNC_ENABLE:
+        wrap_handlers_async(
+            logger,
+            maxsize=settings.LAMB_LOG_ASYNC_QUEUE_SIZE,
+            batch_size=settings.LAMB_LOG_ASYNC_BATCH_SIZE,
+            sampling=settings.LAMB_LOG_DEBUG_SAMPLING,
+        )
+
+
+@worker_process_init.connect
+def setup_worker_process(*args, **kwargs):
+    # answer profile broadcasts of debug/profile endpoint
+    profile_listener_start("celery")
+
+
+# metrics of beat and worker pool are exported by main process from multiprocess storage
+@worker_init.connect
+def setup_worker_metrics(*args, **kwargs):
+    start_metrics_exporter(settings.LAMB_CELERY_WORKER_METRICS_PORT)
+
+
+@beat_init.connect
+def setup_beat_metrics(*args, **kwargs):
+    start_metrics_exporter(settings.LAMB_CELERY_BEAT_METRICS_PORT)
+
+
+@worker_process_shutdown.connect
+def teardown_worker_process(pid=None, *args, **kwargs):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid or os.getpid())
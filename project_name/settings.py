@@ -68,7 +68,7 @@ LAMB_RESPONSE_DATE_FORMAT = "%Y.%m.%d"
 LAMB_DPATH_DICT_ENGINE = "reduce"
 
 LAMB_DEVICE_INFO_COLLECT_IP = True
-LAMB_DEVICE_INFO_COLLECT_GEO = False
+LAMB_DEVICE_INFO_COLLECT_GEO = False  # cached lookups provided by api.middleware.GeoIPMiddleware
 
 LAMB_EXECUTION_TIME_STORE = dpath_value(
     os.environ,
@@ -98,16 +98,49 @@ LAMB_ADD_CORS_ENABLED = dpath_value(
     transform=transform_boolean,
     default=False,
 )
+LAMB_PROFILING_ENABLED = dpath_value(
+    os.environ,
+    "LAMB_PROFILING_ENABLED",
+    str,
+    transform=transform_boolean,
+    default=False,
+)
+LAMB_PROFILING_HEADER = "HTTP_X_LAMB_PROFILE"
+LAMB_PROFILING_INTERVAL = 0.005
+LAMB_PROFILING_REQUEST_INTERVAL = 0.001
+LAMB_PROFILING_MAX_SECONDS = 20
+LAMB_METRICS_ENABLED = dpath_value(os.environ, "LAMB_METRICS_ENABLED", str, transform=transform_boolean, default=True)
+LAMB_METRICS_SAMPLE_RATE = dpath_value(os.environ, "LAMB_METRICS_SAMPLE_RATE", float, default=1.0)
+# scrapers connect to workers directly - requests relayed by proxy (X-Forwarded-For) are treated as external
+LAMB_METRICS_ALLOWED_NETWORKS = dpath_value(
+    os.environ,
+    "LAMB_METRICS_ALLOWED_NETWORKS",
+    str,
+    transform=tf_list_string,
+    default=["127.0.0.0/8", "10.0.0.0/8", "172.16.0.0/12", "192.168.0.0/16", "::1/128", "fc00::/7"],
+)
+LAMB_HEALTH_CACHE_TTL = dpath_value(os.environ, "LAMB_HEALTH_CACHE_TTL", float, default=5.0)
+LAMB_HEALTH_PROBE_TIMEOUT = dpath_value(os.environ, "LAMB_HEALTH_PROBE_TIMEOUT", float, default=1.0)
 
 
 # SPO: db connections
+# isolated schema placed first in search_path, used by test workers
+APP_POSTGRES_SCHEMA = dpath_value(os.environ, "APP_POSTGRES_SCHEMA", str, default=None)
+
+
 def _connect_options(
     cfg, sync: bool, pooled: bool, target_session_attrs: str | None = None
 ):
+    result = {}
     if cfg.multi_host and target_session_attrs is not None:
-        return {"target_session_attrs": target_session_attrs}
-    else:
-        return {}
+        result["target_session_attrs"] = target_session_attrs
+    if APP_POSTGRES_SCHEMA is not None:
+        search_path = f"{APP_POSTGRES_SCHEMA},public"
+        if sync:
+            result["options"] = f"-csearch_path={search_path}"
+        else:
+            result["server_settings"] = {"search_path": search_path}
+    return result
 
 
 LAMB_DB_CONFIG = {
@@ -162,14 +195,17 @@ LAMB_DB_CONTEXT_POOLED_SETTINGS = True
 # SPO: S3 connections
 LAMB_S3_CONFIG = {
     "default": S3BucketConfig(
-        bucket_name="dev-bucket",
-        access_key="123456",
-        secret_key="13=23456",
-        endpoint_url="http://minio:9000/dev-bucket",
-        bucket_url="http://minio:9000/dev-bucket",
+        bucket_name=dpath_value(os.environ, "LAMB_S3_BUCKET_NAME", str, default="dev-bucket"),
+        access_key=dpath_value(os.environ, "LAMB_S3_ACCESS_KEY", str, default="123456"),
+        secret_key=dpath_value(os.environ, "LAMB_S3_SECRET_KEY", str, default="13=23456"),
+        endpoint_url=dpath_value(os.environ, "LAMB_S3_ENDPOINT_URL", str, default="http://minio:9000"),
+        bucket_url=dpath_value(os.environ, "LAMB_S3_BUCKET_URL", str, default="http://minio:9000/dev-bucket"),
         check_buckets_list=False,
     )
 }
+LAMB_S3_UPLOAD_PART_SIZE = dpath_value(os.environ, "LAMB_S3_UPLOAD_PART_SIZE", int, default=8 * 1024 * 1024)
+LAMB_S3_UPLOAD_CONCURRENCY = dpath_value(os.environ, "LAMB_S3_UPLOAD_CONCURRENCY", int, default=4)
+LAMB_S3_PRESIGN_EXPIRES = dpath_value(os.environ, "LAMB_S3_PRESIGN_EXPIRES", int, default=15 * 60)
 
 # SPO: Redis connections
 LAMB_REDIS_HOST = dpath_value(os.environ, "LAMB_REDIS_HOST", str, transform=tf_list_string, default=["localhost"])
@@ -214,12 +250,67 @@ LAMB_BROKER_RESULT_URL = LAMB_REDIS_CONFIG["result"].broker_url
 LAMB_BROKER_TRANSPORT_OPTIONS = LAMB_REDIS_CONFIG["broker"].broker_transport_options
 LAMB_BROKER_RESULT_TRANSPORT_OPTIONS = LAMB_REDIS_CONFIG["result"].broker_transport_options
 
+# SPO: celery beat
+LAMB_BEAT_LEASE_TTL = dpath_value(os.environ, "LAMB_BEAT_LEASE_TTL", float, default=30.0)
+LAMB_BEAT_LOCK_TTL = dpath_value(os.environ, "LAMB_BEAT_LOCK_TTL", float, default=3600.0)
+LAMB_BEAT_LATE_THRESHOLD = dpath_value(os.environ, "LAMB_BEAT_LATE_THRESHOLD", float, default=60.0)
+
+# SPO: celery metrics
+# http ports of exporters in main process of worker and beat, 0 disables exporter
+LAMB_CELERY_WORKER_METRICS_PORT = dpath_value(os.environ, "LAMB_CELERY_WORKER_METRICS_PORT", int, default=9101)
+LAMB_CELERY_BEAT_METRICS_PORT = dpath_value(os.environ, "LAMB_CELERY_BEAT_METRICS_PORT", int, default=9102)
+
+
+# SPO: user event rollups
+LAMB_USER_EVENT_ROLLUP_INTERVAL = dpath_value(os.environ, "LAMB_USER_EVENT_ROLLUP_INTERVAL", float, default=60.0)
+LAMB_USER_EVENT_ROLLUP_BATCH_SIZE = dpath_value(os.environ, "LAMB_USER_EVENT_ROLLUP_BATCH_SIZE", int, default=10000)
+LAMB_USER_EVENT_ROLLUP_TIME_ZONE = dpath_value(os.environ, "LAMB_USER_EVENT_ROLLUP_TIME_ZONE", str, default="UTC")
+LAMB_USER_EVENT_ROLLUP_MAX_DAYS = 366
+
+
+# SPO: email
+EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_HOST = dpath_value(os.environ, "LAMB_SMTP_HOST", str, default="") or "localhost"
+EMAIL_PORT = int(dpath_value(os.environ, "LAMB_SMTP_PORT", str, default="") or 25)
+EMAIL_HOST_USER = dpath_value(os.environ, "LAMB_SMTP_USER", str, default="")
+EMAIL_HOST_PASSWORD = dpath_value(os.environ, "LAMB_SMTP_PASS", str, default="")
+EMAIL_USE_TLS = transform_boolean(dpath_value(os.environ, "LAMB_SMTP_TLS", str, default="") or "false")
+EMAIL_USE_SSL = transform_boolean(dpath_value(os.environ, "LAMB_SMTP_SSL", str, default="") or "false")
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = dpath_value(os.environ, "LAMB_SMTP_FROM", str, default="") or "noreply@localhost"
+
+LAMB_SMTP_RATE_LIMIT = dpath_value(os.environ, "LAMB_SMTP_RATE_LIMIT", float, default=10.0)
+LAMB_SMTP_RATE_BURST = dpath_value(os.environ, "LAMB_SMTP_RATE_BURST", int, default=5)
+LAMB_SMTP_BATCH_SIZE = dpath_value(os.environ, "LAMB_SMTP_BATCH_SIZE", int, default=100)
+LAMB_SMTP_MAX_ATTEMPTS = dpath_value(os.environ, "LAMB_SMTP_MAX_ATTEMPTS", int, default=5)
+LAMB_SMTP_DRAIN_TIME_LIMIT = dpath_value(os.environ, "LAMB_SMTP_DRAIN_TIME_LIMIT", float, default=60.0)
+# claimed messages of drain not acked within lease are returned to queue
+LAMB_SMTP_CLAIM_LEASE = dpath_value(os.environ, "LAMB_SMTP_CLAIM_LEASE", float, default=300.0)
 
 # Lamb: dynamic configs
+LAMB_DYNAMIC_CONFIG_POLL_INTERVAL = dpath_value(os.environ, "LAMB_DYNAMIC_CONFIG_POLL_INTERVAL", float, default=30.0)
+
+# SPO: request coalescing
+LAMB_COALESCE_ENABLED = dpath_value(os.environ, "LAMB_COALESCE_ENABLED", str, transform=transform_boolean, default=True)
+LAMB_COALESCE_MAX_WAITERS = dpath_value(os.environ, "LAMB_COALESCE_MAX_WAITERS", int, default=1000)
+LAMB_COALESCE_SHARED_TIMEOUT = dpath_value(os.environ, "LAMB_COALESCE_SHARED_TIMEOUT", float, default=5.0)
+LAMB_COALESCE_VARY_HEADERS = ["HTTP_AUTHORIZATION", "HTTP_X_LAMB_AUTH_TOKEN", "HTTP_ACCEPT_LANGUAGE"]
+
+# Lamb: geoip
 LAMB_GEOIP2_DB_CITY = BASE_DIR.joinpath("data", "geoip", "GeoLite2-City.mmdb")
 LAMB_GEOIP2_DB_COUNTRY = BASE_DIR.joinpath("data", "geoip", "GeoLite2-Country.mmdb")
 LAMB_GEOIP2_DB_ASN = BASE_DIR.joinpath("data", "geoip", "GeoLite2-ASN.mmdb")
+LAMB_GEOIP_SERVICE_ENABLED = dpath_value(
+    os.environ,
+    "LAMB_GEOIP_SERVICE_ENABLED",
+    str,
+    transform=transform_boolean,
+    default=False,
+)
+LAMB_GEOIP_CACHE_SIZE = dpath_value(os.environ, "LAMB_GEOIP_CACHE_SIZE", int, default=65536)
+LAMB_GEOIP_RELOAD_INTERVAL = dpath_value(os.environ, "LAMB_GEOIP_RELOAD_INTERVAL", float, default=60.0)
 
+# Lamb: folders
 LAMB_RUN_FOLDER = BASE_DIR.joinpath("run")
 LAMB_TMP_FOLDER = BASE_DIR.joinpath("tmp")
 LAMB_LOG_FOLDER = BASE_DIR.joinpath("log")
@@ -228,6 +319,34 @@ LAMB_SYSTEM_STATIC_FOLDER = BASE_DIR.joinpath("system-static")
 LAMB_STATIC_FOLDER = BASE_DIR.joinpath("static")
 LAMB_TEMPLATE_FOLDER = BASE_DIR.joinpath("templates")
 
+# Lamb: auth tokens
+LAMB_AUTH_HEADER = "HTTP_X_LAMB_AUTH_TOKEN"
+LAMB_AUTH_EXEMPT_URLS = [r"^/api/(ping|ready|metrics|configs)/?$"]
+LAMB_AUTH_NEGATIVE_CACHE_SIZE = dpath_value(os.environ, "LAMB_AUTH_NEGATIVE_CACHE_SIZE", int, default=100000)
+LAMB_AUTH_NEGATIVE_CACHE_TTL = dpath_value(os.environ, "LAMB_AUTH_NEGATIVE_CACHE_TTL", float, default=600.0)
+LAMB_AUTH_TOKEN_MODE = dpath_value(os.environ, "LAMB_AUTH_TOKEN_MODE", str, default="DB")
+LAMB_AUTH_JWT_ALGORITHM = dpath_value(os.environ, "LAMB_AUTH_JWT_ALGORITHM", str, default="EdDSA")
+LAMB_AUTH_JWT_KEY_ID = dpath_value(os.environ, "LAMB_AUTH_JWT_KEY_ID", str, default="main")
+LAMB_AUTH_JWT_PRIVATE_KEY = dpath_value(
+    os.environ,
+    "LAMB_AUTH_JWT_PRIVATE_KEY",
+    str,
+    default=LAMB_CRT_FOLDER.joinpath("jwt-private.pem"),
+)
+LAMB_AUTH_JWT_PUBLIC_KEYS_EXTRA = dpath_value(
+    os.environ, "LAMB_AUTH_JWT_PUBLIC_KEYS_EXTRA", str, transform=tf_list_string, default=[]
+)
+LAMB_AUTH_JWT_ACCESS_TOKEN_TTL = dpath_value(os.environ, "LAMB_AUTH_JWT_ACCESS_TOKEN_TTL", int, default=60 * 15)
+LAMB_AUTH_JWT_REVOCATION_CHECK = dpath_value(
+    os.environ,
+    "LAMB_AUTH_JWT_REVOCATION_CHECK",
+    str,
+    transform=transform_boolean,
+    default=False,
+)
+LAMB_AUTH_JWT_REVOCATION_CACHE_SIZE = 100000
+LAMB_AUTH_JWT_REVOCATION_CACHE_TTL = dpath_value(os.environ, "LAMB_AUTH_JWT_REVOCATION_CACHE_TTL", float, default=5.0)
+
 _full_host = furl.furl()
 _full_host.scheme = LAMB_APP_SCHEME
 _full_host.host = LAMB_APP_SERVERNAME
@@ -244,6 +363,28 @@ with open(os.path.join(BASE_DIR, "VERSION")) as f:
 _log_fmt_cls = "lamb.log.formatters.RequestJsonFormatter" if LAMB_LOG_JSON_ENABLE else "lamb.log.formatters.MultilineFormatter"
 _log_fmt = LAMB_LOG_FORMAT_SIMPLE if sys.platform == "darwin" else LAMB_LOG_FORMAT_PREFIXNO
 
+LAMB_LOG_ASYNC_ENABLE = dpath_value(os.environ, "LAMB_LOG_ASYNC_ENABLE", str, transform=transform_boolean, default=True)
+LAMB_LOG_ASYNC_QUEUE_SIZE = dpath_value(os.environ, "LAMB_LOG_ASYNC_QUEUE_SIZE", int, default=10000)
+LAMB_LOG_ASYNC_BATCH_SIZE = dpath_value(os.environ, "LAMB_LOG_ASYNC_BATCH_SIZE", int, default=256)
+LAMB_LOG_DEBUG_SAMPLING = {
+    "api": dpath_value(os.environ, "LAMB_LOG_DEBUG_SAMPLING_API", float, default=1.0),
+}
+
+if LAMB_LOG_ASYNC_ENABLE:
+    _log_console_handler = {
+        "class": "core.log.AsyncQueueHandler",
+        "listener": "core.log.BatchQueueListener",
+        "queue": {"()": "queue.Queue", "maxsize": LAMB_LOG_ASYNC_QUEUE_SIZE},
+        "handlers": ["console_stream"],
+        "batch_size": LAMB_LOG_ASYNC_BATCH_SIZE,
+        "sampling": LAMB_LOG_DEBUG_SAMPLING,
+    }
+else:
+    _log_console_handler = {
+        "class": "logging.StreamHandler",
+        "formatter": "generic",
+    }
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -254,11 +395,15 @@ LOGGING = {
         },
     },
     "handlers": {
-        "console": {
+        "console_stream": {
             "level": "DEBUG",
             "class": "logging.StreamHandler",
             "formatter": "generic",
-        }
+        },
+        "console": {
+            "level": "DEBUG",
+            **_log_console_handler,
+        },
     },
     "loggers": {
         "django": {
@@ -310,11 +455,22 @@ MIDDLEWARE = [
     "lamb.middleware.grequest.LambGRequestMiddleware",
     "lamb.middleware.cors.LambCorsMiddleware",
     "lamb.middleware.xray.LambXRayMiddleware",
+    "api.middleware.ProfilingMiddleware",
     "lamb.middleware.device_info.LambDeviceInfoMiddleware",
+    "api.middleware.GeoIPMiddleware",
+    "api.middleware.TokenAuthMiddleware",
+    "api.middleware.CoalesceMiddleware",
     "lamb.middleware.db.LambSQLAlchemyMiddleware",
     "lamb.middleware.execution_time.LambExecutionTimeMiddleware",
     "lamb.middleware.rest.LambRestApiJsonMiddleware",
 ]
+if LAMB_METRICS_ENABLED:
+    # timer in front of every middleware observes its exclusive time, trailing one closes the chain
+    MIDDLEWARE = [
+        "api.middleware.MetricsMiddleware",
+        *[path for m in MIDDLEWARE for path in ("api.middleware.MiddlewareTimer", m)],
+        "api.middleware.MiddlewareTimer",
+    ]
 
 ROOT_URLCONF = "{{project_name}}.urls"
 
@@ -402,8 +558,13 @@ _msg = {
         LAMB_APP_SCHEME=LAMB_APP_SCHEME,
         LAMB_APP_GOD_MODE=LAMB_APP_GOD_MODE,
         LAMB_LOG_JSON_ENABLE=LAMB_LOG_JSON_ENABLE,
+        LAMB_LOG_ASYNC_ENABLE=LAMB_LOG_ASYNC_ENABLE,
         LAMB_EXECUTION_TIME_STORE=LAMB_EXECUTION_TIME_STORE,
         LAMB_ADD_CORS_ENABLED=LAMB_ADD_CORS_ENABLED,
+        LAMB_METRICS_ENABLED=LAMB_METRICS_ENABLED,
+        LAMB_METRICS_SAMPLE_RATE=LAMB_METRICS_SAMPLE_RATE,
+        LAMB_AUTH_TOKEN_MODE=LAMB_AUTH_TOKEN_MODE,
+        LAMB_GEOIP_SERVICE_ENABLED=LAMB_GEOIP_SERVICE_ENABLED,
     ),
     "S3": {k: masked_dict(v.response_encode(), "access_key", "secret_key") for k, v in LAMB_S3_CONFIG.items()},
 }
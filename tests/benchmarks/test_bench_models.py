@@ -0,0 +1,64 @@
+import random
+from unittest import mock
+
+import pytest
+from django.conf import settings
+from sqlalchemy import select
+
+from lamb.utils import tz_now
+
+from api.models import AccessToken, Operator, UserEvent
+from core.constants import AccessTokenMode, UserRole
+
+
+@pytest.fixture
+def db_mode():
+    with mock.patch.object(settings, "LAMB_AUTH_TOKEN_MODE", AccessTokenMode.DB.value):
+        yield
+
+
+def test_operators_listing(benchmark, db_session, seed):
+    query = select(Operator).order_by(Operator.user_id).limit(5_000)
+
+    def listing():
+        # expunge to measure full load as in request scoped sessions
+        db_session.expunge_all()
+        return [{"user_id": u.user_id, "role": u.role.handbook_encode()} for u in db_session.scalars(query)]
+
+    assert len(benchmark(listing)) == 5_000
+
+
+def test_role_column_decode(benchmark, db_session, seed):
+    query = select(Operator.user_id, Operator.role)
+
+    result = benchmark(lambda: db_session.execute(query).all())
+
+    assert len(result) == len(seed.operator_ids)
+    assert result[0].role is UserRole.OPERATOR
+
+
+def test_access_token_validate(benchmark, db_session, seed, db_mode):
+    tokens = db_session.scalars(select(AccessToken.access_token).where(AccessToken.time_expire > tz_now())).all()
+    rnd = random.Random(0)
+
+    def validate():
+        db_session.expunge_all()
+        return AccessToken.validate(db_session, rnd.choice(tokens))
+
+    assert benchmark(validate).role is UserRole.OPERATOR
+
+
+def test_user_events_page(benchmark, db_session, seed):
+    rnd = random.Random(0)
+
+    def page():
+        db_session.expunge_all()
+        query = (
+            select(UserEvent)
+            .where(UserEvent.user_id == rnd.choice(seed.operator_ids))
+            .order_by(UserEvent.time_created.desc())
+            .limit(50)
+        )
+        return [(e.event_id, e.time_created, e.event_code.handbook_encode()) for e in db_session.scalars(query)]
+
+    benchmark(page)
@@ -0,0 +1,10 @@
+def test_configs_view(benchmark, client):
+    response = benchmark(client.get, "/api/configs")
+
+    assert response.status_code == 200
+
+
+def test_ping_view(benchmark, client):
+    response = benchmark(client.get, "/api/ping")
+
+    assert response.status_code == 200
@@ -0,0 +1,152 @@
+"""Test and benchmark harness
+
+Every xdist worker runs against own postgres schema created from rendered model DDL, so suite runs in
+parallel on all cores:
+
+    pytest -n auto
+
+Benchmarks are disabled by pytest-benchmark under xdist, run them in single process. Save baseline once per
+machine and compare later runs with it, LAMB_BENCHMARK_THRESHOLD (default mean:20%) fails regressed run:
+
+    pytest tests/benchmarks --benchmark-only --benchmark-save=baseline
+    pytest tests/benchmarks --benchmark-only --benchmark-compare
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import uuid
+from unittest import mock
+
+import pytest
+import sqlalchemy as sa
+
+# seeded volumes of every worker schema
+SEED_OPERATORS = 10_000
+SEED_USER_EVENTS = 100_000
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # settings read schema on import, so it should be known before django setup
+    os.environ["APP_POSTGRES_SCHEMA"] = f"test_{os.environ.get('PYTEST_XDIST_WORKER', 'main')}"
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "{{ project_name }}.settings")
+
+    import django
+
+    django.setup()
+
+    if config.pluginmanager.hasplugin("benchmark") and config.getoption("benchmark_compare"):
+        from pytest_benchmark.utils import parse_compare_fail
+
+        if not config.getoption("benchmark_compare_fail"):
+            threshold = os.environ.get("LAMB_BENCHMARK_THRESHOLD", "mean:20%")
+            config.option.benchmark_compare_fail = [parse_compare_fail(threshold)]
+
+
+def _schema_ddl(metadata: sa.MetaData, dialect: sa.Dialect) -> str:
+    """Renders DDL of metadata once - whole schema is created in single round trip"""
+    statements = []
+    engine = sa.create_mock_engine(
+        sa.URL.create(dialect.name),
+        lambda sql, *args, **kwargs: statements.append(str(sql.compile(dialect=dialect)).strip()),
+    )
+    metadata.create_all(engine, checkfirst=False)
+    return ";\n".join(statements) + ";"
+
+
+@pytest.fixture(scope="session")
+def db_schema() -> str:
+    from django.conf import settings
+
+    from lamb.db import DeclarativeBase
+    from lamb.db.session import lamb_db_session_maker
+
+    import api.models  # noqa: F401 - register tables
+
+    schema = settings.APP_POSTGRES_SCHEMA
+    session = lamb_db_session_maker()
+    try:
+        connection = session.connection()
+        connection.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE')
+        connection.exec_driver_sql(f'CREATE SCHEMA "{schema}"')
+        connection.exec_driver_sql(f'SET LOCAL search_path TO "{schema}", public')
+        connection.exec_driver_sql(_schema_ddl(DeclarativeBase.metadata, connection.dialect))
+        session.commit()
+
+        yield schema
+
+        session.rollback()
+        session.execute(sa.text(f'DROP SCHEMA IF EXISTS "{schema}" CASCADE'))
+        session.commit()
+    finally:
+        session.close()
+
+
+@dataclasses.dataclass(frozen=True)
+class Seed:
+    operator_ids: list[uuid.UUID]
+    access_tokens: list[str]
+    user_events: int
+
+
+@pytest.fixture(scope="session")
+def seed(db_schema) -> Seed:
+    """Realistic volumes committed once per worker, tests should not modify them"""
+    from lamb.db.session import lamb_db_session_maker
+
+    from tests.factories import seed_access_tokens, seed_operators, seed_user_events
+
+    session = lamb_db_session_maker()
+    try:
+        operator_ids = seed_operators(session, SEED_OPERATORS)
+        access_tokens = seed_access_tokens(session, operator_ids)
+        user_events = seed_user_events(session, operator_ids, SEED_USER_EVENTS)
+        session.commit()
+        # planner statistics as on production sized tables
+        session.execute(sa.text("ANALYZE"))
+        session.commit()
+    finally:
+        session.close()
+    return Seed(operator_ids=operator_ids, access_tokens=access_tokens, user_events=user_events)
+
+
+@pytest.fixture
+def db_session(db_schema):
+    """Session rolled back after test"""
+    from lamb.db.session import lamb_db_session_maker
+
+    session = lamb_db_session_maker()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def client(db_schema):
+    from django.conf import settings
+    from django.test import Client
+
+    return Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+
+
+@pytest.fixture
+def jwt_keys(tmp_path):
+    """JWT signing key generated for test instead of crt/jwt-private.pem"""
+    from django.conf import settings
+
+    from core import tokens
+    from tests.factories import write_jwt_key
+
+    with (
+        mock.patch.object(settings, "LAMB_AUTH_JWT_PRIVATE_KEY", str(write_jwt_key(tmp_path / "main.pem"))),
+        mock.patch.object(settings, "LAMB_AUTH_JWT_KEY_ID", "main"),
+        mock.patch.object(settings, "LAMB_AUTH_JWT_PUBLIC_KEYS_EXTRA", []),
+        mock.patch.object(settings, "LAMB_AUTH_JWT_ALGORITHM", "EdDSA"),
+    ):
+        tokens._key_set.cache_clear()
+        yield
+    tokens._key_set.cache_clear()
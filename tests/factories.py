@@ -0,0 +1,141 @@
+"""Bulk fixtures loaded with COPY, orders of magnitude faster than ORM inserts on realistic volumes"""
+
+from __future__ import annotations
+
+import datetime
+import enum
+import io
+import json
+import random
+import secrets
+import socket
+import uuid
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import Any
+
+import sqlalchemy as sa
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+from django.contrib.auth.hashers import make_password
+from sqlalchemy.orm import Session
+
+from lamb.utils import tz_now
+
+from api.models import AbstractUser, AccessToken, Operator, UserEvent
+from core.constants import UserEventCode, UserRole
+
+__all__ = ["copy_rows", "seed_operators", "seed_access_tokens", "seed_user_events", "write_jwt_key", "free_port"]
+
+_ESCAPE = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# share of event codes in production traffic
+_EVENT_WEIGHTS = {
+    UserEventCode.LOGIN: 80,
+    UserEventCode.LOGIN_FAILED: 15,
+    UserEventCode.PASSWORD_CHANGE: 5,
+}
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return r"\N"
+    if isinstance(value, enum.Enum):
+        value = value.value
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime.datetime | datetime.date):
+        return value.isoformat()
+    if isinstance(value, dict | list):
+        value = json.dumps(value)
+    return str(value).translate(_ESCAPE)
+
+
+def copy_rows(session: Session, table: sa.Table, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """Loads rows into table with COPY FROM STDIN inside session transaction, returns number of rows"""
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(_copy_value(v) for v in row))
+        buffer.write("\n")
+        count += 1
+    buffer.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{table.name}" ({", ".join(columns)}) FROM STDIN', buffer)
+    finally:
+        cursor.close()
+    return count
+
+
+def seed_operators(session: Session, count: int, password: str = "password") -> list[uuid.UUID]:
+    # hashing is slow by design - all operators share one hash
+    password_hash = make_password(password)
+    now = tz_now()
+    user_ids = [uuid.uuid4() for _ in range(count)]
+
+    copy_rows(
+        session,
+        AbstractUser.__table__,
+        ["user_id", "role", "password_hash", "is_active", "time_created", "time_updated"],
+        ((user_id, UserRole.OPERATOR, password_hash, True, now, now) for user_id in user_ids),
+    )
+    copy_rows(session, Operator.__table__, ["operator_id"], ((user_id,) for user_id in user_ids))
+    return user_ids
+
+
+def seed_access_tokens(
+    session: Session, user_ids: Sequence[uuid.UUID], expired_share: float = 0.1, seed: int = 0
+) -> list[str]:
+    """One DB mode token per user, expired_share of them already expired"""
+    rnd = random.Random(seed)
+    now = tz_now()
+    tokens = []
+
+    def rows():
+        for user_id in user_ids:
+            token = secrets.token_urlsafe(64)
+            tokens.append(token)
+            ttl = datetime.timedelta(hours=-1 if rnd.random() < expired_share else 24)
+            yield token, secrets.token_urlsafe(64), now + ttl, user_id, now, now
+
+    copy_rows(
+        session,
+        AccessToken.__table__,
+        ["access_token", "refresh_token", "time_expire", "user_id", "time_created", "time_updated"],
+        rows(),
+    )
+    return tokens
+
+
+def seed_user_events(session: Session, user_ids: Sequence[uuid.UUID], count: int, days: int = 90, seed: int = 0) -> int:
+    """Events spread over last days with production mix of codes"""
+    rnd = random.Random(seed)
+    now = tz_now()
+    codes, weights = list(_EVENT_WEIGHTS), list(_EVENT_WEIGHTS.values())
+
+    def rows():
+        for code in rnd.choices(codes, weights, k=count):
+            created = now - datetime.timedelta(seconds=rnd.randrange(days * 86400))
+            yield rnd.choice(user_ids), code, {"subject": None, "comment": None}, created, created
+
+    return copy_rows(
+        session,
+        UserEvent.__table__,
+        ["user_id", "event_code", "context", "time_created", "time_updated"],
+        rows(),
+    )
+
+
+def write_jwt_key(path: Path) -> Path:
+    """Fresh Ed25519 signing key in PEM file"""
+    path.write_bytes(Ed25519PrivateKey.generate().private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()))
+    return path
+
+
+def free_port() -> int:
+    """Free local port for test servers"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
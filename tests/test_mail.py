@@ -0,0 +1,96 @@
+import smtplib
+from unittest import mock
+
+import pytest
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+from django.conf import settings
+
+from core.mail import MailConnectionError, Mailer, MailMessage, MailTransientError
+from tests.factories import free_port
+
+_USER, _PASSWORD = "mailer", "secret"
+
+
+class _Handler:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("busy@"):
+            return "451 Try again later"
+        if address.startswith("missing@"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted"
+
+
+def _authenticator(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=auth_data.login == _USER.encode() and auth_data.password == _PASSWORD.encode())
+
+
+@pytest.fixture
+def smtp_server():
+    handler = _Handler()
+    controller = Controller(
+        handler, hostname="127.0.0.1", port=free_port(), authenticator=_authenticator, auth_require_tls=False
+    )
+    controller.start()
+    try:
+        with (
+            mock.patch.object(settings, "EMAIL_HOST", controller.hostname),
+            mock.patch.object(settings, "EMAIL_PORT", controller.port),
+            mock.patch.object(settings, "EMAIL_HOST_USER", _USER),
+            mock.patch.object(settings, "EMAIL_HOST_PASSWORD", _PASSWORD),
+            mock.patch.object(settings, "EMAIL_USE_TLS", False),
+            mock.patch.object(settings, "EMAIL_USE_SSL", False),
+        ):
+            yield handler
+    finally:
+        controller.stop()
+
+
+def _message(to: str) -> MailMessage:
+    return MailMessage(to=[to], subject="Subject", body="Body")
+
+
+def test_send_reuses_connection(smtp_server):
+    mailer = Mailer(rate_limit=0)
+    try:
+        mailer.send(_message("first@example.com"))
+        connection = mailer._connection
+        mailer.send(_message("second@example.com"))
+        assert mailer._connection is connection
+    finally:
+        mailer.close()
+    assert [m.rcpt_tos for m in smtp_server.messages] == [["first@example.com"], ["second@example.com"]]
+
+
+def test_send_login_rejected_is_connection_error(smtp_server):
+    mailer = Mailer(rate_limit=0)
+    with mock.patch.object(settings, "EMAIL_HOST_PASSWORD", "wrong"), pytest.raises(MailConnectionError):
+        mailer.send(_message("user@example.com"))
+    assert mailer._connection is None
+    assert not smtp_server.messages
+
+
+def test_send_server_unreachable_is_connection_error(smtp_server):
+    mailer = Mailer(rate_limit=0)
+    with mock.patch.object(settings, "EMAIL_PORT", 1), pytest.raises(MailConnectionError):
+        mailer.send(_message("user@example.com"))
+
+
+def test_send_recipient_responses(smtp_server):
+    mailer = Mailer(rate_limit=0)
+    try:
+        with pytest.raises(MailTransientError) as e:
+            mailer.send(_message("busy@example.com"))
+        assert not isinstance(e.value, MailConnectionError)
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            mailer.send(_message("missing@example.com"))
+    finally:
+        mailer.close()
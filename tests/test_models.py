@@ -0,0 +1,69 @@
+import datetime
+from unittest import mock
+
+import pytest
+from django.conf import settings
+from sqlalchemy import func, select
+
+import lamb.exc as exc
+from lamb.utils import tz_now
+
+from api.models import AbstractUser, AccessToken, Operator, UserEvent
+from core.constants import AccessTokenMode, UserEventCode, UserRole
+
+
+def test_operators_polymorphic_load(db_session, seed):
+    user_ids = seed.operator_ids[:100]
+    users = db_session.scalars(select(AbstractUser).where(AbstractUser.user_id.in_(user_ids))).all()
+
+    assert len(users) == len(user_ids)
+    assert all(isinstance(u, Operator) and u.role is UserRole.OPERATOR for u in users)
+
+
+@pytest.mark.parametrize("mode", list(AccessTokenMode))
+def test_access_token_roundtrip(db_session, seed, jwt_keys, mode):
+    with mock.patch.object(settings, "LAMB_AUTH_TOKEN_MODE", mode.value):
+        user = db_session.get(Operator, seed.operator_ids[0])
+        token = AccessToken.generate(user)
+        db_session.add(token)
+        db_session.flush()
+
+        claims = AccessToken.validate(db_session, token.access_token)
+
+    assert claims.user_id == user.user_id
+    assert claims.role is UserRole.OPERATOR
+    # JWT exp has second precision
+    assert abs(token.access_time_expire - claims.time_expire) < datetime.timedelta(seconds=1)
+    assert token.access_time_expire <= token.time_expire
+
+
+def test_access_token_invalid(db_session, seed):
+    with (
+        mock.patch.object(settings, "LAMB_AUTH_TOKEN_MODE", AccessTokenMode.DB.value),
+        pytest.raises(exc.AuthTokenInvalidError),
+    ):
+        AccessToken.validate(db_session, "x" * 86)
+
+
+def test_access_token_expired(db_session, seed):
+    token = db_session.scalars(select(AccessToken).where(AccessToken.time_expire <= tz_now()).limit(1)).one()
+
+    with (
+        mock.patch.object(settings, "LAMB_AUTH_TOKEN_MODE", AccessTokenMode.DB.value),
+        pytest.raises(exc.AuthTokenExpiredError),
+    ):
+        AccessToken.validate(db_session, token.access_token)
+
+
+def test_user_event_codes_decode(db_session, seed):
+    counts = dict(db_session.execute(select(UserEvent.event_code, func.count()).group_by(UserEvent.event_code)).all())
+
+    assert set(counts) == set(UserEventCode)
+    assert sum(counts.values()) == seed.user_events
+
+
+def test_configs_view(client):
+    response = client.get("/api/configs")
+
+    assert response.status_code == 200
+    assert response.json()["user_roles"] == [m.handbook_encode() for m in UserRole]
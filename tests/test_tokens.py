@@ -0,0 +1,80 @@
+import uuid
+from unittest import mock
+
+import pytest
+from django.conf import settings
+
+import lamb.exc as exc
+
+from core import tokens
+from core.constants import UserRole
+from tests.factories import write_jwt_key
+
+
+class _RevocationStore(dict):
+    # in-memory stand-in of redis commands used by revocation
+    def set(self, key, value, ex=None):
+        self[key] = str(value)
+
+
+@pytest.fixture
+def revocation():
+    store = _RevocationStore()
+    with (
+        mock.patch.object(settings, "LAMB_AUTH_JWT_REVOCATION_CHECK", True),
+        mock.patch.object(tokens, "_revoked", None),
+        mock.patch.object(tokens, "redis_client", lambda *args, **kwargs: store),
+    ):
+        yield store
+
+
+def test_jwt_roundtrip(jwt_keys):
+    user_id = uuid.uuid4()
+    token, time_expire = tokens.jwt_encode_access_token(user_id, UserRole.ADMIN, ttl=60)
+
+    claims = tokens.jwt_decode_access_token(token)
+
+    assert claims.user_id == user_id
+    assert claims.role is UserRole.ADMIN
+    assert abs((claims.time_expire - time_expire).total_seconds()) < 1
+
+
+def test_jwt_expired(jwt_keys):
+    token, _ = tokens.jwt_encode_access_token(uuid.uuid4(), UserRole.OPERATOR, ttl=-1)
+
+    with pytest.raises(exc.AuthTokenExpiredError):
+        tokens.jwt_decode_access_token(token)
+
+
+def test_jwt_foreign_key_rejected(jwt_keys, tmp_path):
+    token, _ = tokens.jwt_encode_access_token(uuid.uuid4(), UserRole.OPERATOR, ttl=60)
+    tokens._key_set.cache_clear()
+
+    with (
+        mock.patch.object(settings, "LAMB_AUTH_JWT_PRIVATE_KEY", str(write_jwt_key(tmp_path / "other.pem"))),
+        pytest.raises(exc.AuthTokenInvalidError),
+    ):
+        tokens.jwt_decode_access_token(token)
+
+
+def test_jwt_tampered(jwt_keys):
+    token, _ = tokens.jwt_encode_access_token(uuid.uuid4(), UserRole.OPERATOR, ttl=60)
+    header, payload, signature = token.split(".")
+
+    with pytest.raises(exc.AuthTokenInvalidError):
+        tokens.jwt_decode_access_token(f"{header}.{payload}.{signature[::-1]}")
+
+
+def test_jwt_revocation(jwt_keys, revocation):
+    user_id = uuid.uuid4()
+    revoked, _ = tokens.jwt_encode_access_token(user_id, UserRole.OPERATOR, ttl=60)
+    tokens.jwt_revoke_user_tokens(user_id)
+    # drop cached "not revoked" answer of this worker
+    tokens._revoked = None
+    issued_after, _ = tokens.jwt_encode_access_token(user_id, UserRole.OPERATOR, ttl=60)
+
+    with pytest.raises(exc.AuthTokenExpiredError):
+        tokens.jwt_decode_access_token(revoked)
+    assert tokens.jwt_decode_access_token(issued_after).user_id == user_id
+    # revocation is not checked unless enabled
+    assert tokens.jwt_decode_access_token(revoked, check_revocation=False).user_id == user_id